@@ -2,15 +2,20 @@ import os
 import re
 import sys
 import flask
-import hashlib
 import datetime as dt
 import typing as t
 from ufs.spec import UFS
 from ufs.impl.tempdir import TemporaryDirectory
 from ufs.utils.pathlib import SafePurePosixPath
+from ufs.utils.digest import digests, checksum_types
+from ufs.utils.jsonify import dumps
+from ufs.utils.http import file_response
 from ufs.access.pathlib import UPath
 from ufs.access.shutil import movefile
 
+UPLOAD_CHUNK_SIZE = 1024*1024
+DOWNLOAD_CHUNK_SIZE = 1024*1024
+
 def RFC3339(ts = None):
   if ts is not None:
     ts = dt.datetime.fromtimestamp(ts)
@@ -18,36 +23,57 @@ def RFC3339(ts = None):
     ts = dt.datetime.now()
   return ts.strftime('%Y-%m-%dT%H:%M:%SZ')
 
-def flask_ufs_for_blob(ufs: UFS, tmpdir: UFS, *, app: t.Union[flask.Flask, flask.Blueprint], public_url: str):
+def json_response(obj):
+  return flask.Response(dumps(obj), mimetype='application/json')
+
+def flask_ufs_for_blob(ufs: UFS, tmpdir: UFS, *, app: t.Union[flask.Flask, flask.Blueprint], public_url: str, digest: str = 'sha256'):
+  ''' :params digest: The hash used for content-addressable object ids (sha256 or blake3)
+  '''
   created_at = RFC3339()
+  drs_url_prefix = re.sub(r'/$', '', re.sub(r'^https', 'drs', public_url))
+  digest_factory = digests[digest]
+  digest_factory() # fail early if the digest is unavailable
+  checksum_type = checksum_types[digest]
   @app.post('/ufs/blob/v1/objects')
   def blob_objects_post():
     import uuid
-    tmp = str(uuid.uuid4())
-    h = hashlib.sha256()
-    with (UPath(tmpdir)/tmp).open('wb') as fw:
+    tmp_path = SafePurePosixPath(str(uuid.uuid4()))
+    h = digest_factory()
+    # chunks are already large, write them straight to the tmpdir without an extra buffering layer
+    fd = tmpdir.open(tmp_path, 'wb')
+    try:
       while True:
-        buf = flask.request.stream.read(tmpdir.CHUNK_SIZE)
+        buf = flask.request.stream.read(UPLOAD_CHUNK_SIZE)
         if not buf:
           break
         h.update(buf)
-        fw.write(buf)
+        tmpdir.write(fd, buf)
+    finally:
+      tmpdir.close(fd)
     object_id = h.hexdigest()
     if not (UPath(ufs)/object_id).exists():
-      movefile(tmpdir, tmp, ufs, object_id)
+      movefile(tmpdir, tmp_path, ufs, object_id)
     else:
-      (UPath(tmpdir)/tmp).unlink()
-    return flask.jsonify(object_id)
+      tmpdir.unlink(tmp_path)
+    return json_response(object_id)
   #
   @app.get('/ufs/blob/v1/objects/<object_id>')
   def blob_objects_get(object_id):
-    if not (UPath(ufs)/object_id).is_file():
+    path = SafePurePosixPath(object_id)
+    try:
+      info = ufs.info(path)
+    except FileNotFoundError:
+      flask.abort(404)
+    if info['type'] != 'file':
       flask.abort(404)
-    return flask.Response(ufs.cat(SafePurePosixPath(object_id)))
+    url = ufs.presign(path)
+    if url is not None:
+      return flask.redirect(url, code=302)
+    return file_response(ufs, path, info, chunk_size=DOWNLOAD_CHUNK_SIZE)
   #
   @app.get('/ga4gh/drs/v1/service-info')
   def drs_service_info():
-    return {
+    return json_response({
       "id": "cloud.maayanlab.ufs",
       "name": "UFS",
       "type": {
@@ -65,27 +91,27 @@ def flask_ufs_for_blob(ufs: UFS, tmpdir: UFS, *, app: t.Union[flask.Flask, flask
       "createdAt": created_at,
       "environment": "test",
       "version": "1.0.0"
-    }
+    })
   @app.get('/ga4gh/drs/v1/objects/<object_id>')
   def drs_objects_get(object_id):
     try:
       info = ufs.info(SafePurePosixPath(object_id))
     except FileNotFoundError:
       return flask.abort(404)
-    return {
+    return json_response({
       "id": object_id,
       "name": object_id,
-      "self_uri": f"{re.sub(r'/$', '', re.sub(r'^https', 'drs', public_url))}/{object_id}",
+      "self_uri": f"{drs_url_prefix}/{object_id}",
       "size": info['size'],
       "created_time": RFC3339(info.get('ctime')),
       "checksums": [
-        {"type": "sha-256", "checksum": object_id},
+        {"type": checksum_type, "checksum": object_id},
       ],
       "access_methods": [
         {'type': 'https', 'access_id': 'https'},
         {'type': 'https', 'access_url': f"{public_url}/ufs/blob/v1/objects/{object_id}"},
       ],
-    }
+    })
   @app.get('/ga4gh/drs/v1/objects/<object_id>/access/<access_id>')
   def drs_objects_access_get(object_id, access_id):
     if access_id != 'https':
@@ -94,10 +120,10 @@ def flask_ufs_for_blob(ufs: UFS, tmpdir: UFS, *, app: t.Union[flask.Flask, flask
       info = ufs.info(SafePurePosixPath(object_id))
     except FileNotFoundError:
       return flask.abort(404)
-    return {
+    return json_response({
       "url": f"{public_url}/ufs/blob/v1/objects/{object_id}",
       # "headers": {},
-    }
+    })
   return app
 
 def create_app():
@@ -115,6 +141,7 @@ def create_app():
     ufs, tmpdir,
     app=flask.Flask(__name__),
     public_url=os.environ.pop('UFS_PUBLIC_URL'),
+    digest=os.environ.pop('UFS_BLOB_DIGEST', 'sha256'),
   )
 
 if __name__ == '__main__':
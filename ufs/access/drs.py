@@ -12,16 +12,39 @@ import flask
 import json
 import typing as t
 import datetime as dt
+import mimetypes
+import functools
 import contextlib
+import collections
 from ufs.spec import UFS
+from ufs.utils.jsonify import dumps
+from ufs.utils.http import file_response
+
+DOWNLOAD_CHUNK_SIZE = 1024*1024
+
+def guess_mimetype(path) -> str:
+  mimetype, _ = mimetypes.guess_type(path.name)
+  return mimetype or 'application/octet-stream'
 
 def sha256(stream):
-  import hashlib
-  h = hashlib.sha256()
+  ''' Hash an iterable of bytes or a binary file object
+  '''
+  from ufs.utils import digest
+  if hasattr(stream, 'readinto'):
+    import hashlib
+    if hasattr(hashlib, 'file_digest'): # python >= 3.11
+      return hashlib.file_digest(stream, digest.sha256).hexdigest()
+    fr, stream = stream, iter(lambda: fr.read(1024*1024), b'')
+  h = digest.sha256()
   for buf in stream:
     h.update(buf)
   return h.hexdigest()
 
+def sha256_file(ufs: UFS, path):
+  from ufs.access.pathlib import UPath
+  with (UPath(ufs)/path).open('rb') as fr:
+    return sha256(fr)
+
 def RFC3339(ts = None):
   if ts is not None:
     ts = dt.datetime.fromtimestamp(ts)
@@ -29,34 +52,76 @@ def RFC3339(ts = None):
     ts = dt.datetime.now()
   return ts.strftime('%Y-%m-%dT%H:%M:%SZ')
 
-def index_ufs_for_drs(ufs: UFS, index: t.MutableMapping[str, t.Any] = {}):
+def index_ufs_for_drs(ufs: UFS, index: t.MutableMapping[str, t.Any] = {}, max_workers: t.Optional[int] = None, cache_path: t.Optional[str] = None):
+  ''' Files are hashed concurrently in a thread pool (hashing & I/O release the GIL),
+  directory bundles are then assembled serially in walk order so ids are unchanged.
+
+  :params cache_path: An sqlite database used to remember file digests by (path, mtime, size)
+    across runs, files which haven't changed since they were last indexed aren't re-read.
+  '''
+  from concurrent.futures import ThreadPoolExecutor
   from ufs.access.shutil import walk
   index['objects'] = {}
   objects = index['objects']
-  index['bundles'] = {}
-  bundles = index['bundles']
+  bundles = collections.defaultdict(list)
   index['sha256sums'] = {}
   sha256sums = index['sha256sums']
-  for path, info in walk(ufs, '/', dirfirst=False):
+  entries = list(walk(ufs, '/', dirfirst=False))
+  file_sha256sums = {}
+  if cache_path is not None:
+    import sqlite3
+    cache = sqlite3.connect(cache_path, timeout=60)
+    cache.execute('CREATE TABLE IF NOT EXISTS digest (path TEXT PRIMARY KEY, mtime REAL, size INTEGER, sha256 TEXT)')
+    cached = {
+      path: (mtime, size, sha256sum)
+      for path, mtime, size, sha256sum in cache.execute('SELECT path, mtime, size, sha256 FROM digest')
+    }
+    for path, info in entries:
+      if info['type'] != 'file' or 'mtime' not in info: continue
+      mtime, size, sha256sum = cached.get(str(path), (None, None, None))
+      if mtime == info['mtime'] and size == info['size']:
+        file_sha256sums[path] = sha256sum
+  files = [path for path, info in entries if info['type'] == 'file' and path not in file_sha256sums]
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    file_sha256sums.update(zip(files, executor.map(lambda path: sha256_file(ufs, path), files)))
+  if cache_path is not None:
+    hashed = set(files)
+    with cache:
+      cache.executemany('INSERT OR REPLACE INTO digest (path, mtime, size, sha256) VALUES (?, ?, ?, ?)', [
+        (str(path), info['mtime'], info['size'], file_sha256sums[path])
+        for path, info in entries
+        if info['type'] == 'file' and 'mtime' in info and path in hashed
+      ])
+    cache.close()
+  for path, info in entries:
+    path_str, parent = str(path), path.parent
     if info['type'] == 'file':
-      sha256sums[str(path)] = sha256sum = sha256(ufs.cat(path))
+      sha256sums[path_str] = sha256sum = file_sha256sums[path]
       objects[sha256sum] = dict(path=path, info=info)
     elif info['type'] == 'directory':
-      if str(path.parent) not in bundles: continue # this would happen with an empty directory (don't make empty bundles)
-      sha256sums[str(path)] = sha256sum = sha256(map(str.encode, bundles[str(path.parent)]))
+      bundle = bundles.get(path_str)
+      if bundle is None: continue # this would happen with an empty directory (don't make empty bundles)
+      sha256sums[path_str] = sha256sum = sha256(map(str.encode, bundle))
       objects[sha256sum] = dict(path=path, info=info)
-    if path != path.parent: # don't add root to itself
-      if str(path.parent) not in bundles:
-        bundles[str(path.parent)] = []
-      bundles[str(path.parent)].append(sha256sum)
+    if path != parent: # don't add root to itself
+      bundles[str(parent)].append(sha256sum)
+  index['bundles'] = dict(bundles)
   return index
 
 def flask_ufs_for_drs(ufs: UFS, index: t.Mapping[str, t.Any], *, app: t.Union[flask.Flask, flask.Blueprint], public_url: str):
   objects = index['objects']
   bundles = index['bundles']
   created_at = RFC3339()
-  @app.get('/ga4gh/drs/v1/service-info')
-  def service_info():
+  drs_url_prefix = re.sub(r'/$', '', re.sub(r'^https', 'drs', public_url))
+  # the index is immutable so responses are serialized once and re-used
+  response_cache = {}
+  def cached_json(key, build):
+    try:
+      data = response_cache[key]
+    except KeyError:
+      data = response_cache[key] = dumps(build())
+    return flask.Response(data, mimetype='application/json')
+  def service_info_data():
     return {
       "id": "cloud.maayanlab.ufs",
       "name": "UFS",
@@ -76,17 +141,28 @@ def flask_ufs_for_drs(ufs: UFS, index: t.Mapping[str, t.Any], *, app: t.Union[fl
       "environment": "test",
       "version": "1.0.0"
     }
-  @app.get('/ga4gh/drs/v1/objects/<object_id>')
-  def objects_get(object_id):
-    expand = json.loads(flask.request.args.get('expand', 'false'))
-    try:
-      drs_object = objects[object_id]
-    except KeyError:
-      return flask.abort(404)
+  @app.get('/ga4gh/drs/v1/service-info')
+  def service_info():
+    return cached_json('service-info', service_info_data)
+  # contents are memoized & shared (never mutated) so expanded trees re-use their subtrees
+  @functools.lru_cache(maxsize=None)
+  def contents(object_id):
+    return [
+      { "id": id, "name": objects[id]['path'].name }
+      for id in bundles[str(objects[object_id]['path'])]
+    ]
+  @functools.lru_cache(maxsize=None)
+  def expanded_contents(object_id):
+    return [
+      dict(item, contents=expanded_contents(item['id'])) if objects[item['id']]['info']['type'] == 'directory' else item
+      for item in contents(object_id)
+    ]
+  def object_data(object_id, expand):
+    drs_object = objects[object_id]
     data = {
       "id": object_id,
       "name": drs_object['path'].name,
-      "self_uri": f"{re.sub(r'/$', '', re.sub(r'^https', 'drs', public_url))}/{object_id}",
+      "self_uri": f"{drs_url_prefix}/{object_id}",
       "size": drs_object['info']['size'],
       "created_time": RFC3339(drs_object['info'].get('ctime')),
       "checksums": [
@@ -100,7 +176,7 @@ def flask_ufs_for_drs(ufs: UFS, index: t.Mapping[str, t.Any], *, app: t.Union[fl
     #
     if drs_object['info']['type'] == 'file':
       data.update({
-        # "mime_type": drs_object.mime_type,
+        "mime_type": guess_mimetype(drs_object['path']),
         "access_methods": [
           {'type': 'https', 'access_id': 'https'},
           {'type': 'https', 'access_url': f"{public_url}/ga4gh/drs/v1/objects/{object_id}/data"},
@@ -109,37 +185,37 @@ def flask_ufs_for_drs(ufs: UFS, index: t.Mapping[str, t.Any], *, app: t.Union[fl
     elif drs_object['info']['type'] == 'directory':
       # add "contents" to data when applicable, expanding
       #  children when expand=true param was specified
-      Q = [data]
-      while Q:
-        item = Q.pop()
-        item_object = objects[item['id']]
-        if item_object['info']['type'] == 'directory':
-          item['contents'] = contents = [
-            { "id": id, "name": objects[id]['path'].name }
-            for id in bundles[str(item_object['path'])]
-          ]
-          if expand: Q += contents
+      data['contents'] = expanded_contents(object_id) if expand else contents(object_id)
     return data
+  @app.get('/ga4gh/drs/v1/objects/<object_id>')
+  def objects_get(object_id):
+    expand = bool(json.loads(flask.request.args.get('expand', 'false')))
+    if object_id not in objects:
+      return flask.abort(404)
+    return cached_json(('objects', object_id, expand), lambda: object_data(object_id, expand))
   @app.get('/ga4gh/drs/v1/objects/<object_id>/access/<access_id>')
   def objects_access_get(object_id, access_id):
     if access_id != 'https':
       return flask.abort(404)
-    try:
-      drs_object = objects[object_id]
-    except KeyError:
+    if object_id not in objects:
       return flask.abort(404)
-    return {
+    return cached_json(('access', object_id), lambda: {
       "url": f"{public_url}/ga4gh/drs/v1/objects/{object_id}/data",
       # "headers": {},
-    }
+    })
   @app.get('/ga4gh/drs/v1/objects/<object_id>/data')
   def objects_data_get(object_id):
     try:
       drs_object = objects[object_id]
     except KeyError:
       return flask.abort(404)
+    # let the client fetch it straight from the underlying store when possible
+    url = ufs.presign(drs_object['path'])
+    if url is not None:
+      return flask.redirect(url, code=302)
     try:
-      return app.response_class(ufs.cat(drs_object['path']))
+      info = ufs.info(drs_object['path'])
+      return file_response(ufs, drs_object['path'], info, mimetype=guess_mimetype(drs_object['path']), chunk_size=DOWNLOAD_CHUNK_SIZE)
     except FileNotFoundError:
       flask.abort(404)
   #
@@ -153,7 +229,7 @@ def create_app():
   def cleanup():
     ufs.stop()
   return flask_ufs_for_drs(
-    ufs, index_ufs_for_drs(ufs),
+    ufs, index_ufs_for_drs(ufs, cache_path=os.environ.pop('UFS_DRS_CACHE', None)),
     app=flask.Flask(__name__),
     public_url=os.environ.pop('UFS_PUBLIC_URL'),
   )
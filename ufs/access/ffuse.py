@@ -1,38 +1,164 @@
 ''' Can be used as a replacement for fuse in development environments, it's quite simple:
 - start: copy files to the mount directory
 - stop: replicate any changes to the mount directory to the ufs and cleanup
+
+When watchdog is installed, changes are tracked as they happen so only modified paths
+ are replicated on stop, otherwise the whole mount directory is diffed against a snapshot
+ and only files whose size or mtime changed are copied back.
 '''
+import os
+import uuid
 import pathlib
+import threading
 import contextlib
-from collections import OrderedDict
 from ufs.spec import UFS
 from ufs.impl.local import Local
 from ufs.impl.prefix import Prefix
 from ufs.utils.pathlib import SafePurePosixPath
-from ufs.access.shutil import walk, copytree, rmtree
+from ufs.access.shutil import walk, copyfile, copytree_parallel, rmtree
+
+class DirtyPathWatcher:
+  ''' Record the paths which get created, modified or removed in the mount directory
+  '''
+  def __init__(self, mount_dir: pathlib.Path):
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    self.mount_dir = str(mount_dir)
+    self.sentinel = f".ffuse-{uuid.uuid4()}"
+    self.synced = threading.Event()
+    self.lock = threading.Lock()
+    self.changed = set()
+    self.removed = set()
+    watcher = self
+    class Handler(FileSystemEventHandler):
+      def on_any_event(self, event):
+        watcher._record(event)
+    self.observer = Observer()
+    self.observer.schedule(Handler(), self.mount_dir, recursive=True)
+    self.observer.start()
+
+  def _relpath(self, path):
+    return SafePurePosixPath(os.path.relpath(os.fsdecode(path), self.mount_dir))
+
+  def _record(self, event):
+    src_path = self._relpath(event.src_path)
+    if src_path.name == self.sentinel:
+      if event.event_type == 'deleted': self.synced.set()
+      return
+    with self.lock:
+      if event.event_type in {'deleted', 'moved'}:
+        self.removed.add(src_path)
+      if event.event_type == 'moved':
+        self.changed.add(self._relpath(event.dest_path))
+      elif event.event_type in {'created', 'closed'} or (event.event_type == 'modified' and not event.is_directory):
+        self.changed.add(src_path)
+
+  def stop(self, timeout: float = 10):
+    ''' Stop watching, returns (changed, removed) or None if we can't be sure we saw every event
+    '''
+    # inotify events are delivered in order, once we see the sentinel removed we've seen everything before it
+    sentinel = pathlib.Path(self.mount_dir) / self.sentinel
+    sentinel.touch()
+    sentinel.unlink()
+    synced = self.synced.wait(timeout)
+    self.observer.stop()
+    self.observer.join()
+    if not synced: return None
+    return self.changed, self.removed
+
+def watch_mount_dir(mount_dir: pathlib.Path):
+  try:
+    return DirtyPathWatcher(mount_dir)
+  except (ImportError, OSError):
+    return None
+
+def sync_dirty_paths(mount_dir_ufs: UFS, ufs: UFS, changed: set, removed: set, max_workers: int = 1):
+  ''' Replicate just the paths which were touched in the mount directory to the ufs
+  '''
+  def try_info(ufs, path):
+    try: return ufs.info(path)
+    except FileNotFoundError: return None
+  for path in sorted(removed, key=lambda path: path.parts):
+    ufs_info = try_info(ufs, path)
+    if ufs_info is None: continue
+    mount_info = try_info(mount_dir_ufs, path)
+    if mount_info is not None and mount_info['type'] == ufs_info['type']: continue
+    if ufs_info['type'] == 'file':
+      ufs.unlink(path)
+    elif ufs_info['type'] == 'directory':
+      rmtree(ufs, path)
+  copied_dirs = set()
+  for path in sorted(changed, key=lambda path: path.parts):
+    if any(SafePurePosixPath(parent) in copied_dirs for parent in path.parents): continue
+    mount_info = try_info(mount_dir_ufs, path)
+    if mount_info is None: continue
+    if mount_info['type'] == 'file':
+      copyfile(mount_dir_ufs, path, ufs, path)
+    elif mount_info['type'] == 'directory':
+      copytree_parallel(mount_dir_ufs, path, ufs, path, exists_ok=True, max_workers=max_workers)
+      copied_dirs.add(path)
+
+def sync_changed_paths(mount_dir_ufs: UFS, ufs: UFS, before: dict, snapshot: bool, max_workers: int = 1):
+  ''' Replicate the mount directory to the ufs by diffing it against what was there before,
+  when `before` is a snapshot of the mount directory itself files with the same size & mtime are skipped
+  '''
+  from concurrent.futures import ThreadPoolExecutor
+  root = SafePurePosixPath()
+  after = dict(walk(mount_dir_ufs, root, dirfirst=True))
+  # before has children before their parents so removals can be replayed in this order
+  for path, info in before.items():
+    if path in after and after[path]['type'] == info['type']: continue
+    if info['type'] == 'file':
+      ufs.unlink(path)
+    elif info['type'] == 'directory':
+      rmtree(ufs, path)
+  copies = []
+  for path, info in after.items():
+    prev = before.get(path)
+    if prev is not None and prev['type'] != info['type']: prev = None
+    if info['type'] == 'directory':
+      if prev is None:
+        try: ufs.mkdir(path)
+        except FileExistsError: pass
+    elif info['type'] == 'file':
+      if snapshot and prev is not None and prev.get('size') == info.get('size') and prev.get('mtime') == info.get('mtime'): continue
+      copies.append(path)
+  if max_workers == 1:
+    for path in copies: copyfile(mount_dir_ufs, path, ufs, path)
+  else:
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+      for _ in executor.map(lambda path: copyfile(mount_dir_ufs, path, ufs, path), copies): pass
 
 @contextlib.contextmanager
-def ffuse_mount(ufs: UFS, mount_dir: str = None, readonly: bool = False):
+def ffuse_mount(ufs: UFS, mount_dir: str = None, readonly: bool = False, max_workers: int = 1, watch: bool = True):
+  ''' :params max_workers: The number of files copied concurrently into & out of the mount directory, the ufs is
+    then called from several threads at once so only raise it for ufs which tolerate that, None sizes the pool automatically
+  :params watch: Track changes with watchdog (if installed) instead of diffing the whole mount directory on stop
+  '''
   from ufs.utils.tempfile import TemporaryMountDirectory
   with TemporaryMountDirectory(mount_dir) as mount_dir:
     assert not any(True for _ in mount_dir.iterdir()), "mount_dir should be empty"
     mount_dir_ufs = Prefix(Local(), mount_dir)
     root = SafePurePosixPath()
-    copytree(ufs, root, mount_dir_ufs, root, exists_ok=True)
+    copytree_parallel(ufs, root, mount_dir_ufs, root, exists_ok=True, max_workers=max_workers)
+    watcher, before = None, None
     if not readonly:
-      before = OrderedDict(walk(mount_dir_ufs, root, dirfirst=False))
+      if watch: watcher = watch_mount_dir(mount_dir)
+      if watcher is None:
+        before = dict(walk(mount_dir_ufs, root, dirfirst=False))
     try:
       yield mount_dir
     finally:
       if not readonly:
-        after = dict(walk(mount_dir_ufs, root, dirfirst=False))
-        for path in (before.keys() - after.keys()):
-          item = before[path]
-          if item['type'] == 'file':
-            ufs.unlink(path)
-          elif item['type'] == 'directory':
-            ufs.rmdir(path)
-        copytree(mount_dir_ufs, root, ufs, root, exists_ok=True)
+        dirty = watcher.stop() if watcher is not None else None
+        if dirty is not None:
+          sync_dirty_paths(mount_dir_ufs, ufs, *dirty, max_workers=max_workers)
+        elif before is not None:
+          sync_changed_paths(mount_dir_ufs, ufs, before, snapshot=True, max_workers=max_workers)
+        else:
+          # the watcher failed us, the ufs itself still reflects what was there before
+          before = dict(walk(ufs, root, dirfirst=False))
+          sync_changed_paths(mount_dir_ufs, ufs, before, snapshot=False, max_workers=max_workers)
       rmtree(mount_dir_ufs, root)
 
 if __name__ == '__main__':
@@ -40,5 +166,7 @@ if __name__ == '__main__':
   ufs = UFS.from_dict(**json.loads(os.environ.pop('UFS_SPEC')))
   mount_dir = pathlib.Path(sys.argv[1])
   assert mount_dir.exists()
-  with ffuse_mount(ufs, mount_dir, bool(os.environ.pop('UFS_READONLY', ''))):
+  max_workers = int(os.environ.pop('UFS_FFUSE_WORKERS', 1)) or None
+  watch = not os.environ.pop('UFS_FFUSE_NOWATCH', '')
+  with ffuse_mount(ufs, mount_dir, bool(os.environ.pop('UFS_READONLY', '')), max_workers=max_workers, watch=watch):
     threading.Event().wait()
@@ -1,101 +1,289 @@
 ''' pyfuse Operations on UFS interface
 '''
 import os
+import queue
 import errno
 import logging
+import operator
 import pathlib
+import posixpath
+import threading
+import functools
 import contextlib
 from ufs.spec import UFS
 from ufs.access.os import UOS
+from ufs.utils.cache import TTLCache
 from fuse import LoggingMixIn, Operations, FuseOSError
 
 logger = logging.getLogger(__name__)
 
+_STAT_KEYS = (
+  'st_atime', 'st_ctime', 'st_gid', 'st_mode', 'st_mtime',
+  'st_nlink', 'st_size', 'st_uid',
+)
+_STAT_ATTRGETTER = operator.attrgetter(*_STAT_KEYS)
+
+def mutating(path_arg: int = 0):
+  ''' Mark a FUSE operation as modifying the filesystem, it's refused with EPERM when mounted readonly
+  :params path_arg: The position of the argument reported in the error
+  '''
+  def decorator(fn):
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+      if self._readonly: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), args[path_arg])
+      return fn(self, *args, **kwargs)
+    return wrapper
+  return decorator
+
+class ReadAheadBuffer:
+  ''' Read the chunks following a sequential reader on a background thread so the backend
+  is never waiting on us. Reads at any other offset are done directly and stop the read ahead
+  until the reader is sequential again.
+  '''
+  def __init__(self, uos: UOS, fh: int, chunk_size: int = 1<<20, capacity: int = 8):
+    self._os = uos
+    self._fh = fh
+    self._chunk_size = chunk_size
+    self._capacity = capacity
+    self._lock = threading.Lock()
+    self._offset = 0
+    self._buffer = memoryview(b'')
+    self._thread = None
+
+  def _produce(self, chunks: queue.Queue, stop: threading.Event, offset: int):
+    while not stop.is_set():
+      try:
+        data = self._os.pread(self._fh, self._chunk_size, offset)
+      except Exception as err:
+        chunks.put(err)
+        return
+      while not stop.is_set():
+        try: chunks.put(data, timeout=0.1)
+        except queue.Full: continue
+        else: break
+      if not data: return
+      offset += len(data)
+
+  def _start(self):
+    self._chunks = queue.Queue(self._capacity)
+    self._stop = threading.Event()
+    self._thread = threading.Thread(target=self._produce, args=(self._chunks, self._stop, self._offset), daemon=True)
+    self._thread.start()
+
+  def _halt(self):
+    if self._thread is None: return
+    self._stop.set()
+    self._thread.join()
+    self._thread = None
+    self._buffer = memoryview(b'')
+
+  def read(self, size: int, offset: int) -> bytes:
+    with self._lock:
+      if offset != self._offset:
+        self._halt()
+        data = self._os.pread(self._fh, size, offset)
+        self._offset = offset + len(data)
+        return data
+      if self._thread is None: self._start()
+      result = []
+      while size > 0:
+        if not self._buffer:
+          data = self._chunks.get()
+          if isinstance(data, Exception):
+            self._thread = None
+            raise data
+          if not data:
+            # put it back, later reads at eof should also get nothing
+            self._chunks.put(data)
+            break
+          self._buffer = memoryview(data)
+        # memoryview slices don't copy, the only copy is the join into the result
+        result.append(self._buffer[:size])
+        self._buffer = self._buffer[size:]
+        size -= len(result[-1])
+      data = b''.join(result)
+      self._offset += len(data)
+      return data
+
+  def close(self):
+    with self._lock:
+      self._halt()
+
 class FUSEOps(LoggingMixIn, Operations):
-  def __init__(self, ufs: UFS, readonly = False) -> None:
+  ''' :params attr_cache_ttl: Seconds to cache getattr/access/readdir results for, 0 to disable
+  :params attr_cache_size: The maximum number of paths to keep in each cache
+  :params inline_threshold: Files at most this size opened for reading are read entirely on open, 0 to disable,
+    the size is taken from the attribute cache so this only applies when it's enabled
+  :params readahead: The number of 1MiB chunks to read ahead of sequential readers of larger files, 0 to disable
+  :params ready: An Event which is set once the filesystem is mounted
+  '''
+  def __init__(self, ufs: UFS, readonly = False, attr_cache_ttl: float = 1.0, attr_cache_size: int = 1024, inline_threshold: int = 1<<20, readahead: int = 8, ready = None) -> None:
     super().__init__()
     self._os = UOS(ufs)
-    # self._lock = Lock()
     self._readonly = readonly
+    self._ready = ready
+    self._inline_threshold = inline_threshold
+    self._inline = {}
+    self._readahead = readahead
+    self._prefetch = {}
+    # handles opened for writing, nothing else has anything to flush or makes our caches stale
+    self._writable = set()
+    if attr_cache_ttl:
+      self._attr_cache = TTLCache(resolve=self._getattr, ttl=attr_cache_ttl, maxsize=attr_cache_size)
+      self._dir_cache = TTLCache(resolve=self._listdir, ttl=attr_cache_ttl, maxsize=attr_cache_size)
+    else:
+      self._attr_cache = self._dir_cache = None
+
+  def _invalidate(self, path, children=False):
+    ''' Forget what we know about path and its parent directory, and everything under path if its children are affected
+    '''
+    if self._attr_cache is None: return
+    if children:
+      self._attr_cache.discard_prefix(path)
+      self._dir_cache.discard_prefix(path)
+    else:
+      self._attr_cache.discard(path)
+      self._dir_cache.discard(path)
+    parent = posixpath.dirname(path)
+    self._attr_cache.discard(parent)
+    self._dir_cache.discard(parent)
+
+  def init(self, path):
+    if self._ready is not None: self._ready.set()
 
   def access(self, path, amode):
     if self._readonly and amode & os.W_OK:
       raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), path)
-    if not self._os.access(path, amode):
-      raise FuseOSError(errno.EACCES)
+    if self._attr_cache is None:
+      if not self._os.access(path, amode):
+        raise FuseOSError(errno.EACCES)
+    else:
+      # access only checks existence, which the attribute cache already knows
+      try: self._attr_cache(path)
+      except OSError: raise FuseOSError(errno.EACCES)
 
+  @mutating()
   def chmod(self, path, *args, **kwargs):
-    if self._readonly: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), path)
     return self._os.chmod(path, *args, **kwargs)
 
+  @mutating()
   def chown(self, path, *args, **kwargs):
-    if self._readonly: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), path)
     return self._os.chown(path, *args, **kwargs)
 
+  @mutating()
   def create(self, path, mode):
-    if self._readonly: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), path)
-    return self._os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    self._invalidate(path)
+    fh = self._os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    self._writable.add(fh)
+    return fh
 
   def flush(self, path, fh):
+    # the kernel flushes on every close(2), including of files which were only read
+    if fh not in self._writable: return
     return self._os.fsync(fh)
 
   def fsync(self, path, datasync, fh):
+    if fh not in self._writable: return
     if datasync != 0:
       return self._os.fdatasync(fh)
     else:
       return self._os.fsync(fh)
 
-  def getattr(self, path, fh=None):
+  def _getattr(self, path):
     st = self._os.stat(path)
-    return dict((key, getattr(st, key)) for key in (
-      'st_atime', 'st_ctime', 'st_gid', 'st_mode', 'st_mtime',
-      'st_nlink', 'st_size', 'st_uid'))
+    return dict(zip(_STAT_KEYS, _STAT_ATTRGETTER(st)))
+
+  def _listdir(self, path):
+    ''' List the directory along with the attributes of its entries, `ls -l` & friends getattr
+    every entry right after readdir and those are then already cached
+    '''
+    entries = self._os.listdir_stat(path)
+    for name, st in entries:
+      self._attr_cache[posixpath.join(path, name)] = dict(zip(_STAT_KEYS, _STAT_ATTRGETTER(st)))
+    return [name for name, _ in entries]
+
+  def getattr(self, path, fh=None):
+    if self._attr_cache is None: return self._getattr(path)
+    # copy so fusepy can't modify what's cached
+    return dict(self._attr_cache(path))
 
+  @mutating(path_arg=1)
   def link(self, target, source):
-    if self._readonly: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), source)
     self._os.link(target, source)
 
+  @mutating()
   def mkdir(self, path, *args, **kwargs):
-    if self._readonly: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), path)
+    self._invalidate(path)
     return self._os.mkdir(path, *args, **kwargs)
 
+  @mutating()
   def mknod(self, path, *args, **kwargs):
-    if self._readonly: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), path)
+    self._invalidate(path)
     return self._os.mknod(path, *args, **kwargs)
 
-  def open(self, path, *args, **kwargs):
-    return self._os.open(path, *args, **kwargs)
+  def open(self, path, flags, *args, **kwargs):
+    fh = self._os.open(path, flags, *args, **kwargs)
+    if self._inline_threshold and self._attr_cache is not None and flags & os.O_ACCMODE == os.O_RDONLY \
+        and self._attr_cache(path)['st_size'] <= self._inline_threshold:
+      # one read instead of many for small files, the kernel looked the path up right before opening it
+      # so its size is cached. it may be stale so make sure we got all of it, the handle was just opened
+      # so it's already at the start & doesn't need a seek
+      data = self._os.read(fh, self._inline_threshold + 1)
+      if len(data) <= self._inline_threshold:
+        self._inline[fh] = data
+    if self._readahead and fh not in self._inline and flags & os.O_ACCMODE == os.O_RDONLY:
+      self._prefetch[fh] = ReadAheadBuffer(self._os, fh, capacity=self._readahead)
+    if flags & os.O_ACCMODE != os.O_RDONLY or flags & (os.O_TRUNC | os.O_APPEND):
+      self._writable.add(fh)
+    return fh
 
   def readlink(self, path, *args, **kwargs):
     return self._os.readlink(path, *args, **kwargs)
 
+  @mutating()
   def rmdir(self, path, *args, **kwargs):
-    if self._readonly: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), path)
+    self._invalidate(path)
     return self._os.rmdir(path, *args, **kwargs)
 
+  @mutating()
   def unlink(self, path, *args, **kwargs):
-    if self._readonly: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), path)
+    self._invalidate(path)
     return self._os.unlink(path, *args, **kwargs)
 
+  @mutating()
   def utimens(self, path, *args, **kwargs):
-    if self._readonly: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), path)
+    self._invalidate(path)
     return self._os.utime(path, *args, **kwargs)
 
   def read(self, path, size, offset, fh):
-    # with self._lock:
-    self._os.lseek(fh, offset, 0)
-    result = self._os.read(fh, size)
-    return result
+    data = self._inline.get(fh)
+    if data is not None: return data[offset:offset+size]
+    prefetch = self._prefetch.get(fh)
+    if prefetch is not None: return prefetch.read(size, offset)
+    return self._os.pread(fh, size, offset)
 
   def readdir(self, path, fh):
-    return ['.', '..'] + self._os.listdir(path)
+    yield '.'
+    yield '..'
+    if self._dir_cache is None: yield from self._os.listdir_iter(path)
+    else: yield from self._dir_cache(path)
 
   def release(self, path, fh):
-    return self._os.close(fh)
+    self._inline.pop(fh, None)
+    prefetch = self._prefetch.pop(fh, None)
+    if prefetch is not None: prefetch.close()
+    try: return self._os.close(fh)
+    finally:
+      if fh in self._writable:
+        self._writable.discard(fh)
+        self._invalidate(path)
 
+  @mutating(path_arg=1)
   def rename(self, old, new):
-    if self._readonly: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), new)
-    return self._os.rename(old, new)
+    try: return self._os.rename(old, new)
+    finally:
+      self._invalidate(old, children=True)
+      self._invalidate(new, children=True)
 
   def statfs(self, path):
     return dict(f_bsize=512, f_blocks=4096, f_bavail=2048)
@@ -109,40 +297,90 @@ class FUSEOps(LoggingMixIn, Operations):
   def symlink(self, target, source):
     return self._os.symlink(source, target)
 
+  @mutating()
   def truncate(self, path, length, fh=None):
-    if self._readonly: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), path)
+    self._invalidate(path)
     self._os.truncate(path, length)
 
+  @mutating()
   def write(self, path, data, offset, fh):
-    # with self._lock:
-    self._os.lseek(fh, offset, 0)
-    result = self._os.write(fh, data)
+    result = self._os.pwrite(fh, data, offset)
+    self._invalidate(path)
     return result
 
   getxattr = None
   listxattr = None
 
-def fuse(ufs_spec: dict, mount_dir: str, readonly: bool):
+def fuse_main(ufs: UFS, mount_dir: str, readonly: bool, nothreads: bool = False, ready = None):
   from fuse import FUSE
+  FUSE(FUSEOps(ufs, readonly=readonly, ready=ready), mount_dir,
+    nothreads=nothreads, foreground=True,
+    # larger requests mean fewer round trips through python
+    big_writes=True, max_read=1<<20, max_write=1<<20,
+    # keep page cache across opens unless the file's mtime changed
+    auto_cache=True,
+    # match FUSEOps' attribute cache
+    entry_timeout=1, attr_timeout=1, negative_timeout=1,
+  )
+
+def fuse(ufs_spec: dict, mount_dir: str, readonly: bool, nothreads: bool = False, ready = None):
   with UFS.from_dict(**ufs_spec) as ufs:
-    FUSE(FUSEOps(ufs, readonly=readonly), mount_dir, nothreads=True, foreground=True)
+    fuse_main(ufs, mount_dir, readonly, nothreads=nothreads, ready=ready)
+
+def wait_ready(ready, timeout: float = 10.0):
+  if not ready.wait(timeout): raise TimeoutError()
+
+def fuse_unmount(mount_dir: str):
+  import shutil
+  import subprocess
+  fusermount = shutil.which('fusermount3') or shutil.which('fusermount') or 'fusermount'
+  subprocess.run([fusermount, '-u', mount_dir], check=True)
 
 @contextlib.contextmanager
-def fuse_mount(ufs: UFS, mount_dir: str = None, readonly: bool = False):
+def fuse_mount(ufs: UFS, mount_dir: str = None, readonly: bool = False, thread: bool = False):
+  ''' :params thread: Serve the mount from a thread in this process using `ufs` as is rather than
+    a fresh copy of it in a spawned process, the ufs must be safe to use from multiple threads.
+
+  Without thread, the mount is served by a copy of the ufs in another process, forked when the ufs supports it
+  or rebuilt with to_dict otherwise. Either way in-memory state isn't shared: e.g. a Memory ufs is served as a
+  private snapshot and writes through the mount never reach the caller's instance.
+  '''
   import signal
   import functools
   import multiprocessing as mp
   from ufs.utils.process import active_process
   from ufs.utils.polling import wait_for, safe_predicate
   from ufs.utils.tempfile import TemporaryMountDirectory
-  mp_spawn = mp.get_context('spawn')
   with TemporaryMountDirectory(mount_dir) as mount_dir:
-    try:
-      with active_process(mp_spawn.Process(target=fuse, args=(ufs.to_dict(), str(mount_dir), readonly)), terminate_signal=signal.SIGINT):
-        wait_for(functools.partial(safe_predicate, mount_dir.is_mount))
+    if thread:
+      ready = threading.Event()
+      fuse_thread = threading.Thread(target=fuse_main, args=(ufs, str(mount_dir), readonly), kwargs=dict(ready=ready), daemon=True)
+      fuse_thread.start()
+      try:
+        wait_ready(ready)
         yield mount_dir
-    finally:
-      wait_for(functools.partial(safe_predicate, lambda: not mount_dir.is_mount()))
+      finally:
+        if safe_predicate(mount_dir.is_mount): fuse_unmount(str(mount_dir))
+        fuse_thread.join()
+    else:
+      if ufs.supports_fork and threading.active_count() == 1:
+        # the forked process gets a working copy of ufs as is, no need to re-import & rebuild it.
+        # only when we're the only thread, a lock held by another thread at fork time (e.g. in a
+        # cache) would stay locked forever in the child
+        mp_ctx = mp.get_context('fork')
+        ready = mp_ctx.Event()
+        proc = mp_ctx.Process(target=fuse_main, args=(ufs, str(mount_dir), readonly), kwargs=dict(ready=ready))
+      else:
+        mp_ctx = mp.get_context('spawn')
+        ready = mp_ctx.Event()
+        proc = mp_ctx.Process(target=fuse, args=(ufs.to_dict(), str(mount_dir), readonly), kwargs=dict(ready=ready))
+      try:
+        with active_process(proc, terminate_signal=signal.SIGINT):
+          # libfuse calls init once the kernel has accepted the mount
+          wait_ready(ready)
+          yield mount_dir
+      finally:
+        wait_for(functools.partial(safe_predicate, lambda: not mount_dir.is_mount()))
 
 
 if __name__ == '__main__':
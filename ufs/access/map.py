@@ -1,63 +1,86 @@
 ''' fsspec style dict mapper repr of a UFS
 '''
 
+import functools
 import typing as t
 import urllib.parse
 from collections.abc import Mapping, MutableMapping
 from ufs.spec import UFS
 from ufs.access.pathlib import UPath
 from ufs.utils.pathlib import rmtree
+from ufs.utils.cache import TTLCache
+
+@functools.lru_cache(maxsize=4096)
+def _quote(key: str) -> str:
+  return urllib.parse.quote(key, safe='')
+
+_unquote = functools.lru_cache(maxsize=4096)(urllib.parse.unquote)
+
+def _type(path: UPath) -> t.Optional[str]:
+  try: return path._ufs.info(path._path)['type']
+  except FileNotFoundError: return None
 
 class UMap(MutableMapping):
   def __init__(self, ufs: UFS = None, upath: UPath = None):
     self._upath = UPath(ufs) if upath is None else upath
+    # a listing is reused briefly so e.g. `len` followed by iteration only lists once
+    self._ls_cache = TTLCache(resolve=self._upath._ufs.ls, ttl=0.1)
 
   def __repr__(self):
-    return f'''UMap({repr(self._upath)}, {repr({
-      key: self[key]
-      for key in self
-    })})'''
+    # just the keys, the values could be arbitrarily large trees of files
+    return f"UMap({repr(self._upath)}, keys={repr(list(self))})"
+
+  def dump(self) -> dict:
+    ''' Read the whole tree into a regular dict
+    '''
+    return {
+      key: value.dump() if isinstance(value, UMap) else value
+      for key, value in self.items()
+    }
 
   def __getitem__(self, key: str) -> t.Union[str, 'UMap']:
-    name = urllib.parse.quote(str(key), safe='')
-    if (self._upath/name).is_file():
-      return (self._upath/name).read_text()
-    elif (self._upath/name).is_dir():
-      return UMap(upath=self._upath/name)
+    path = self._upath/_quote(str(key))
+    path_type = _type(path)
+    if path_type == 'file':
+      return path.read_text()
+    elif path_type == 'directory':
+      return UMap(upath=path)
     else:
       raise KeyError(key)
 
   def __setitem__(self, key: str, value: t.Union[str, Mapping]):
-    name = urllib.parse.quote(str(key), safe='')
-    if (self._upath/name).exists():
-      if (self._upath/name).is_file(): (self._upath/name).unlink()
-      elif (self._upath/name).is_dir(): rmtree(self._upath/name)
+    path = self._upath/_quote(str(key))
+    self._ls_cache.discard(self._upath._path)
+    path_type = _type(path)
+    if path_type == 'file': path.unlink()
+    elif path_type == 'directory': rmtree(path)
     if type(value) == str:
-      (self._upath/name).write_text(value)
+      path.write_text(value)
     elif isinstance(value, Mapping):
-      (self._upath/name).mkdir()
-      submap = UMap(upath=self._upath/name)
+      path.mkdir()
+      submap = UMap(upath=path)
       for k, v in value.items():
         submap[k] = v
     else:
       raise NotImplementedError(value)
 
   def __delitem__(self, key: str) -> None:
-    name = urllib.parse.quote(str(key), safe='')
-    if (self._upath/name).is_file():
-      return (self._upath/name).unlink()
-    elif (self._upath/name).is_dir():
-      return rmtree(self._upath/name)
+    path = self._upath/_quote(str(key))
+    self._ls_cache.discard(self._upath._path)
+    path_type = _type(path)
+    if path_type == 'file':
+      return path.unlink()
+    elif path_type == 'directory':
+      return rmtree(path)
     else:
       raise KeyError(key)
 
   def __iter__(self):
-    for item in self._upath.iterdir():
-      yield urllib.parse.unquote(item.name)
+    for name in self._ls_cache(self._upath._path):
+      yield _unquote(name)
 
   def __contains__(self, key: str):
-    name = urllib.parse.quote(str(key), safe='')
-    return (self._upath/name).exists()
+    return (self._upath/_quote(str(key))).exists()
 
   def __len__(self) -> int:
-    return sum(1 for _ in self._upath.iterdir())
+    return len(self._ls_cache(self._upath._path))
@@ -3,13 +3,17 @@
 
 import asyncio
 import logging
+import functools
+import threading
 import contextlib
 from ufs.spec import UFS
 
 logger = logging.getLogger(__name__)
 
-@contextlib.contextmanager
-def mount(ufs: UFS, mount_dir: str = None, readonly: bool = False, fuse: bool = None):
+@functools.lru_cache(maxsize=None)
+def _resolve_mount(fuse: bool = None):
+  ''' Find the mount implementation once, subsequent mounts re-use the answer
+  '''
   if fuse is None:
     try:
       from ufs.access.fuse import fuse_mount as _mount
@@ -23,28 +27,51 @@ def mount(ufs: UFS, mount_dir: str = None, readonly: bool = False, fuse: bool =
     from ufs.access.fuse import fuse_mount as _mount
   else:
     from ufs.access.ffuse import ffuse_mount as _mount
-  with _mount(ufs, mount_dir, readonly=readonly) as p:
+  return _mount
+
+@contextlib.contextmanager
+def mount(ufs: UFS, mount_dir: str = None, readonly: bool = False, fuse: bool = None):
+  with _resolve_mount(fuse)(ufs, mount_dir, readonly=readonly) as p:
     yield p
 
-def _async_mount_thread(loop: asyncio.AbstractEventLoop, send: asyncio.Queue, completed: asyncio.Event, ufs: UFS, mount_dir: str = None, readonly: bool = False, fuse: bool = None):
-  with mount(ufs, mount_dir, readonly, fuse) as mount_dir:
-    asyncio.run_coroutine_threadsafe(send.put(mount_dir), loop).result()
-    asyncio.run_coroutine_threadsafe(completed.wait(), loop).result()
+def _async_mount_thread(loop: asyncio.AbstractEventLoop, mounted: asyncio.Future, completed: threading.Event, ufs: UFS, mount_dir: str = None, readonly: bool = False, fuse: bool = None):
+  def resolve(result=None, err=None):
+    if mounted.done(): return
+    if err is None: mounted.set_result(result)
+    else: mounted.set_exception(err)
+  try:
+    with mount(ufs, mount_dir, readonly, fuse) as mount_dir:
+      loop.call_soon_threadsafe(resolve, mount_dir)
+      completed.wait()
+  except BaseException as e:
+    # unblock async_mount if we never got to send the mount_dir
+    loop.call_soon_threadsafe(resolve, None, e)
+    raise
 
 async def to_thread(loop, func, *args):
   return await loop.run_in_executor(None, func, *args)
 
-@contextlib.asynccontextmanager
-async def async_mount(ufs: UFS, mount_dir: str = None, readonly: bool = False, fuse: bool = None):
-  loop = asyncio.get_event_loop()
-  completed = asyncio.Event()
-  recv = asyncio.Queue()
-  mount_task = asyncio.create_task(to_thread(loop, _async_mount_thread, loop, recv, completed, ufs, mount_dir, readonly, fuse))
-  mount_task.add_done_callback(asyncio.Task.result)
-  mount_dir = await recv.get()
-  recv.task_done()
-  try:
-    yield mount_dir
-  finally:
-    completed.set()
-    await mount_task
+class AsyncMount:
+  ''' Mount the ufs from a thread for the duration of an `async with`, which gives the mount directory
+  '''
+  def __init__(self, ufs: UFS, mount_dir: str = None, readonly: bool = False, fuse: bool = None):
+    self._args = (ufs, mount_dir, readonly, fuse)
+    self._completed = threading.Event()
+    self._mount_task = None
+
+  async def __aenter__(self):
+    loop = asyncio.get_running_loop()
+    mounted = loop.create_future()
+    self._mount_task = asyncio.create_task(to_thread(loop, _async_mount_thread, loop, mounted, self._completed, *self._args))
+    try:
+      return await mounted
+    except BaseException:
+      await self.__aexit__(None, None, None)
+      raise
+
+  async def __aexit__(self, exc_type, exc, tb):
+    self._completed.set()
+    await self._mount_task
+
+def async_mount(ufs: UFS, mount_dir: str = None, readonly: bool = False, fuse: bool = None):
+  return AsyncMount(ufs, mount_dir, readonly, fuse)
@@ -6,10 +6,12 @@ import time
 import errno
 import typing as t
 import logging
+import threading
 import traceback
-import contextlib
-from ufs.spec import UFS
+import collections
+from ufs.spec import UFS, FileStat
 from ufs.utils.pathlib import SafePurePosixPath, pathparent
+from ufs.utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -19,29 +21,81 @@ StrOrBytesPath = t.Union[str, bytes, os.PathLike]
 FileDescriptorOrPath = t.Union[int, StrOrBytesPath]
 ReadableBuffer = bytes
 
-@contextlib.contextmanager
-def oserror(path: str = None):
-  try:
-    yield
-  except FileNotFoundError: raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
-  except FileExistsError: raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), path)
-  except NotADirectoryError: raise NotADirectoryError(errno.ENOTDIR, os.strerror(errno.ENOTDIR), path)
-  except IsADirectoryError: raise IsADirectoryError(errno.EISDIR, os.strerror(errno.EISDIR), path)
-  except PermissionError: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM), path)
-  except NotImplementedError: raise OSError(errno.ENOTSUP, os.strerror(errno.ENOTSUP), path)
-  except:
-    logger.error(traceback.format_exc())
-    raise OSError(errno.ENOTSUP, os.strerror(errno.ENOTSUP), path)
+# errors are common (e.g. probing for existence) so we don't look these up every time
+_STRERROR = {
+  err: os.strerror(err)
+  for err in (errno.ENOENT, errno.EEXIST, errno.ENOTDIR, errno.EISDIR, errno.EPERM, errno.ENOTSUP)
+}
+
+# ufs exceptions and the errno they correspond to
+_ERRNO = (
+  (FileNotFoundError, errno.ENOENT),
+  (FileExistsError, errno.EEXIST),
+  (NotADirectoryError, errno.ENOTDIR),
+  (IsADirectoryError, errno.EISDIR),
+  (PermissionError, errno.EPERM),
+)
+
+_MODE_FILE = stat.S_IFREG | 0o644
+_MODE_DIR = stat.S_IFDIR | 0o755
+
+class oserror:
+  ''' Re-raise exceptions from the ufs as the OSError the os module would raise for path
+
+  :params paths: The path to report for specific errnos (e.g. the destination of a rename) instead of path
+  '''
+  __slots__ = ('path', 'paths')
+  def __init__(self, path: str = None, paths: t.Dict[int, str] = None):
+    self.path = path
+    self.paths = paths
+  def __enter__(self):
+    return self
+  def _path(self, err):
+    return self.path if self.paths is None else self.paths.get(err, self.path)
+  def __exit__(self, exc_type, exc, tb):
+    if exc_type is None: return False
+    for err_type, err in _ERRNO:
+      if issubclass(exc_type, err_type):
+        raise err_type(err, _STRERROR[err], self._path(err))
+    if not issubclass(exc_type, NotImplementedError):
+      logger.error(''.join(traceback.format_exception(exc_type, exc, tb)))
+    raise OSError(errno.ENOTSUP, _STRERROR[errno.ENOTSUP], self._path(errno.ENOTSUP))
 
 class UOS:
   ''' A class implementing `os.` methods for a `ufs`
+
+  :params info_ttl: Seconds to cache info for, 0 to disable
+  :params negative_ttl: Seconds to remember that a path doesn't exist for, defaults to info_ttl
+  :params accurate_nlink: List directories on stat to count their links, otherwise directories report 2
   '''
-  def __init__(self, ufs: UFS):
+  def __init__(self, ufs: UFS, info_ttl: float = 0, accurate_nlink: bool = False, negative_ttl: float = None):
     self._ufs = ufs
+    self._accurate_nlink = accurate_nlink
+    self._uid = int(os.environ.get('UID', 1000))
+    self._gid = int(os.environ.get('GID', 1000))
+    self._info_cache = TTLCache(resolve=ufs.info, ttl=info_ttl, maxsize=20000, negative_ttl=negative_ttl) if info_ttl or negative_ttl else None
+    # paths of descriptors opened for writing, writes make the cached info stale
+    self._fd_paths = {}
+    # ufs descriptors have a cursor, positional reads/writes must seek & read/write together
+    self._fd_locks = collections.defaultdict(threading.Lock)
 
   def __repr__(self):
     return f"UOS({repr(self._ufs)})"
 
+  def _info(self, path: SafePurePosixPath):
+    if self._info_cache is None: return self._ufs.info(path)
+    return self._info_cache(path)
+
+  def _forget(self, path: SafePurePosixPath, subtree: bool = False):
+    if self._info_cache is None: return
+    if subtree: self._info_cache.discard_prefix(path)
+    else: self._info_cache.discard(path)
+    self._info_cache.discard(path.parent)
+
+  def _forget_fd(self, fd: int):
+    path = self._fd_paths.get(fd)
+    if path is not None: self._forget(path)
+
   def access(
     self,
     path: FileDescriptorOrPath,
@@ -51,7 +105,7 @@ class UOS:
     effective_ids: bool = False,
     follow_symlinks: bool = True
   ) -> bool:
-    try: info = self._ufs.info(SafePurePosixPath(path))
+    try: info = self._info(SafePurePosixPath(path))
     except: return False
     else: return True
 
@@ -92,7 +146,13 @@ class UOS:
     else: mode = 'rb'
     with oserror(path):
       logger.debug(f"open({path}, {mode}) {flags}")
-      return self._ufs.open(SafePurePosixPath(path), mode)
+      if mode == 'rb':
+        return self._ufs.open(SafePurePosixPath(path), mode)
+      path = SafePurePosixPath(path)
+      self._forget(path)
+      fd = self._ufs.open(path, mode)
+      if self._info_cache is not None: self._fd_paths[fd] = path
+      return fd
 
   def fsync(
     self,
@@ -113,20 +173,27 @@ class UOS:
     dir_fd: t.Optional[int] = None
   ) -> os.stat_result:
     with oserror(path):
-      info = self._ufs.info(SafePurePosixPath(path))
-      nlink = 2 + len(self._ufs.ls(SafePurePosixPath(path))) if info['type'] == 'directory' else 1
-      return os.stat_result([
-        (stat.S_IFREG | 0o644 if info['type'] == 'file' else stat.S_IFDIR | 0o755),#st_mode
-        0,#st_ino
-        0,#st_dev
-        nlink,#st_nlink
-        int(os.environ.get('UID', 1000)),#st_uid
-        int(os.environ.get('GID', 1000)),#st_gid
-        info['size'] if info['type'] == 'file' else 0,#st_size
-        info.get('atime', time.time()),#st_atime
-        info.get('ctime', time.time()),#st_mtime
-        info.get('mtime', time.time()),#st_ctime
-      ])
+      path = SafePurePosixPath(path)
+      return self._stat_result(path, self._info(path))
+
+  def _stat_result(self, path: SafePurePosixPath, info: FileStat, now: float = None) -> os.stat_result:
+    if info['type'] != 'directory': nlink = 1
+    elif self._accurate_nlink: nlink = 2 + len(self._ufs.ls(path))
+    else: nlink = 2
+    is_file = info['type'] == 'file'
+    if now is None: now = time.time()
+    return os.stat_result((
+      _MODE_FILE if is_file else _MODE_DIR,#st_mode
+      0,#st_ino
+      0,#st_dev
+      nlink,#st_nlink
+      self._uid,#st_uid
+      self._gid,#st_gid
+      info['size'] if is_file else 0,#st_size
+      info.get('atime', now),#st_atime
+      info.get('ctime', now),#st_mtime
+      info.get('mtime', now),#st_ctime
+    ))
 
   def link(
     self,
@@ -147,7 +214,9 @@ class UOS:
     dir_fd: t.Optional[int] = None
   ) -> None:
     with oserror(path):
-      self._ufs.mkdir(SafePurePosixPath(path))
+      path = SafePurePosixPath(path)
+      self._forget(path)
+      self._ufs.mkdir(path)
 
   def mknod(
     self,
@@ -174,7 +243,9 @@ class UOS:
     dir_fd: t.Optional[int] = None
   ) -> None:
     with oserror(path):
-      self._ufs.rmdir(SafePurePosixPath(path))
+      path = SafePurePosixPath(path)
+      self._forget(path, subtree=True)
+      self._ufs.rmdir(path)
   
   def unlink(
     self,
@@ -183,7 +254,9 @@ class UOS:
     dir_fd: t.Optional[int] = None
   ) -> None:
     with oserror(path):
-      self._ufs.unlink(SafePurePosixPath(path))
+      path = SafePurePosixPath(path)
+      self._forget(path)
+      self._ufs.unlink(path)
 
   def utime(
     self,
@@ -202,14 +275,31 @@ class UOS:
     __position: int,
     __how: int = 0,
   ) -> int:
-    return self._ufs.seek(__fd, __position, __how)
+    with self._fd_locks[__fd]:
+      return self._ufs.seek(__fd, __position, __how)
 
   def read(
     self,
     __fd: int,
     __length: int,
   ) -> bytes:
-    return self._ufs.read(__fd, __length)
+    with self._fd_locks[__fd]:
+      return self._ufs.read(__fd, __length)
+
+  def pread(
+    self,
+    __fd: int,
+    __length: int,
+    __offset: int,
+  ) -> bytes:
+    # like os.pread the file position is left where it was
+    with self._fd_locks[__fd]:
+      pos = self._ufs.seek(__fd, 0, 1)
+      try:
+        self._ufs.seek(__fd, __offset, 0)
+        return self._ufs.read(__fd, __length)
+      finally:
+        self._ufs.seek(__fd, pos, 0)
   
   def listdir(
     self,
@@ -217,11 +307,39 @@ class UOS:
   ) -> t.List[str]:
     with oserror(path):
       return self._ufs.ls(SafePurePosixPath(path))
+
+  def listdir_stat(
+    self,
+    path: StrPath
+  ) -> t.List[t.Tuple[str, os.stat_result]]:
+    ''' Like listdir but with the stat of each entry, the ufs lists them in bulk (ls_detail) where it can
+    rather than us stat'ing every entry
+    '''
+    with oserror(path):
+      path = SafePurePosixPath(path)
+      now = time.time()
+      return [
+        (name, self._stat_result(path / name, info, now))
+        for name, info in self._ufs.ls_detail(path).items()
+      ]
+
+  def listdir_iter(
+    self,
+    path: t.Optional[StrPath] = None
+  ) -> t.Iterator[str]:
+    ''' Like listdir but entries are yielded rather than collected into a new list
+    '''
+    with oserror(path):
+      listing = self._ufs.ls(SafePurePosixPath(path))
+    yield from listing
   
   def close(
     self,
     fd: int
   ) -> None:
+    self._fd_locks.pop(fd, None)
+    path = self._fd_paths.pop(fd, None)
+    if path is not None: self._forget(path)
     return self._ufs.close(fd)
 
   def rename(
@@ -232,17 +350,17 @@ class UOS:
     src_dir_fd: t.Optional[int] = None,
     dst_dir_fd: t.Optional[int] = None
   ) -> None:
-    try:
-      self._ufs.rename(SafePurePosixPath(src), SafePurePosixPath(dst))
-    except FileNotFoundError: raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), src)
-    except FileExistsError: raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), dst)
-    except NotADirectoryError: raise NotADirectoryError(errno.ENOTDIR, os.strerror(errno.ENOTDIR), pathparent(dst))
-    except IsADirectoryError: raise IsADirectoryError(errno.EISDIR, os.strerror(errno.EISDIR), dst)
-    except PermissionError: raise PermissionError(errno.EPERM, os.strerror(errno.EPERM))
-    except NotImplementedError: raise OSError(errno.ENOTSUP, os.strerror(errno.ENOTSUP))
-    except:
-      logger.error(traceback.format_exc())
-      raise OSError(errno.ENOTSUP, os.strerror(errno.ENOTSUP))
+    with oserror(src, {
+      errno.EEXIST: dst,
+      errno.ENOTDIR: pathparent(dst),
+      errno.EISDIR: dst,
+      errno.EPERM: None,
+      errno.ENOTSUP: None,
+    }):
+      src, dst = SafePurePosixPath(src), SafePurePosixPath(dst)
+      self._forget(src, subtree=True)
+      self._forget(dst, subtree=True)
+      self._ufs.rename(src, dst)
   
   def statvfs(
     self,
@@ -266,7 +384,25 @@ class UOS:
     __fd: int,
     __data: ReadableBuffer,
   ) -> int:
-    return self._ufs.write(__fd, __data)
+    self._forget_fd(__fd)
+    with self._fd_locks[__fd]:
+      return self._ufs.write(__fd, __data)
+
+  def pwrite(
+    self,
+    __fd: int,
+    __data: ReadableBuffer,
+    __offset: int,
+  ) -> int:
+    # like os.pwrite the file position is left where it was
+    with self._fd_locks[__fd]:
+      pos = self._ufs.seek(__fd, 0, 1)
+      try:
+        self._ufs.seek(__fd, __offset, 0)
+        self._forget_fd(__fd)
+        return self._ufs.write(__fd, __data)
+      finally:
+        self._ufs.seek(__fd, pos, 0)
 
   def truncate(
     self,
@@ -274,6 +410,8 @@ class UOS:
     length: int
   ) -> None:
     with oserror(path):
-      fd = self._ufs.open(SafePurePosixPath(path), 'r+')
+      path = SafePurePosixPath(path)
+      self._forget(path)
+      fd = self._ufs.open(path, 'r+')
       self._ufs.truncate(fd, length)
       self._ufs.close(fd)
@@ -1,15 +1,93 @@
 ''' Implement a pathlib.Path-like interface to UFS
 '''
+import io
+import os
+import re
+import fnmatch
+import weakref
+import functools
+import collections
+import typing as t
 from ufs.spec import UFS, AsyncUFS
 from ufs.utils.pathlib import SafePurePosixPath, PathLike
-from ufs.utils.io import RawBinaryIO, BufferedBinaryIO, BufferedIO, AsyncRawBinaryIO, AsyncBufferedBinaryIO, AsyncBufferedIO
+from ufs.utils.io import BufferedBinaryIO, BufferedIO, AsyncRawBinaryIO, AsyncBufferedBinaryIO, AsyncBufferedIO
+from ufs.utils.cache import TTLCacheStore, Result
+
+INFO_CACHE_SIZE = 20000
+
+_info_caches = weakref.WeakKeyDictionary()
+
+def shared_info_cache(ufs: t.Union[UFS, AsyncUFS]) -> TTLCacheStore:
+  ''' The info cache for every UPath/AsyncUPath of this ufs, so paths constructed independently
+  still benefit from (and invalidate) what the others have seen
+  '''
+  try:
+    return _info_caches[ufs]
+  except KeyError:
+    return _info_caches.setdefault(ufs, TTLCacheStore(ttl=0, maxsize=INFO_CACHE_SIZE))
+
+@functools.lru_cache(maxsize=256)
+def _compile_glob(pattern: str, case_sensitive: bool):
+  ''' A matcher for names equivalent to fnmatch.fnmatchcase, or fnmatch.fnmatch when not case_sensitive,
+  compiled once per pattern rather than looked up for every name
+  '''
+  # fnmatch.fnmatch only ignores case where os.path.normcase does
+  flags = re.IGNORECASE if not case_sensitive and os.path.normcase('A') == 'a' else 0
+  return re.compile(fnmatch.translate(pattern), flags).match
+
+# newline values which the stdlib's io buffers can handle
+_io_newlines = {b'\n', None, '', '\n', '\r', '\r\n'}
 
 class UPath:
   ''' A class implementing `pathlib.Path` methods for a `ufs`
+
+  :params info_ttl: Seconds to cache info (existence & type) for, the cache is shared by all the UPaths of a ufs
+  :params negative_ttl: Seconds to remember that a path doesn't exist for, defaults to info_ttl
   '''
-  def __init__(self, ufs: UFS, path: PathLike = '/') -> None:
+  __slots__ = ('_ufs', '_path', '_info_ttl', '_negative_ttl', '_info_cache')
+
+  def __init__(self, ufs: UFS, path: PathLike = '/', *, info_ttl: float = 0, negative_ttl: float = None) -> None:
     self._ufs = ufs
     self._path = SafePurePosixPath(path)
+    self._info_ttl = info_ttl
+    self._negative_ttl = info_ttl if negative_ttl is None else negative_ttl
+    self._info_cache = shared_info_cache(ufs) if info_ttl or negative_ttl else None
+
+  def _derive(self, path: SafePurePosixPath):
+    upath = self.__class__(self._ufs, path)
+    upath._info_ttl = self._info_ttl
+    upath._negative_ttl = self._negative_ttl
+    upath._info_cache = self._info_cache
+    return upath
+
+  def _info(self):
+    if self._info_cache is None: return self._ufs.info(self._path)
+    try:
+      item = self._info_cache[self._path]
+    except KeyError:
+      try:
+        item = Result(val=self._ufs.info(self._path))
+      except Exception as err:
+        item = Result(err=err)
+        self._info_cache.set(self._path, item, self._negative_ttl)
+      else:
+        self._info_cache.set(self._path, item, self._info_ttl)
+    if item.err is not None: raise item.err
+    return item.val
+
+  def _forget(self, path: SafePurePosixPath = None, subtree: bool = False):
+    # even when we're not caching, other paths of this ufs might be
+    info_cache = self._info_cache if self._info_cache is not None else _info_caches.get(self._ufs)
+    if info_cache is None: return
+    if path is None: path = self._path
+    if subtree: info_cache.discard_prefix(path)
+    else: info_cache.discard(path)
+    info_cache.discard(path.parent)
+
+  def forget_subtree(self):
+    ''' Drop any cached info for this path and everything under it
+    '''
+    self._forget(subtree=True)
   
   @property
   def name(self):
@@ -21,7 +99,7 @@ class UPath:
 
   @property
   def parent(self):
-    return UPath(self._ufs, self._path.parent)
+    return self._derive(self._path.parent)
 
   def __str__(self):
     return str(self._path)
@@ -36,64 +114,89 @@ class UPath:
     return self._ufs is other._ufs and self._path == other._path
 
   def __truediv__(self, subpath: PathLike):
-    return self.__class__(self._ufs, self._path / subpath)
+    return self._derive(self._path / subpath)
 
   def exists(self):
     try:
-      self._ufs.info(self._path)
+      self._info()
       return True
     except FileNotFoundError:
       return False
 
   def is_file(self):
     try:
-      return self._ufs.info(self._path)['type'] == 'file'
+      return self._info()['type'] == 'file'
     except FileNotFoundError:
       return False
 
   def is_dir(self):
     try:
-      return self._ufs.info(self._path)['type'] == 'directory'
+      return self._info()['type'] == 'directory'
     except FileNotFoundError:
       return False
 
-  def open(self, mode: str, encoding='utf-8', newline=b'\n'):
-    if 'b' in mode:
-      return BufferedBinaryIO(
-        UPathBinaryIO(self._ufs, self._ufs.open(self._path, mode)),
-        chunk_size=self._ufs.CHUNK_SIZE,
-        newline=newline,
-      )
-    else:
-      if mode.endswith('+'): mode_ = mode[:-1] + 'b+'
-      else: mode_ = mode + 'b'
-      return BufferedIO(
-        UPathBinaryIO(self._ufs, self._ufs.open(self._path, mode_)),
-        chunk_size=self._ufs.CHUNK_SIZE,
-        encoding=encoding,
-        newline=newline,
-      )
+  def open(self, mode: str, encoding='utf-8', newline=b'\n', buffering=-1, readahead=False):
+    ''' :params buffering: Like the builtin open, -1 buffers (and coalesces writes) up to the ufs's CHUNK_SIZE,
+    0 is unbuffered (binary only), 1 is line buffered (text only), anything else is the buffer size
+    :params readahead: When reading sequentially, fetch the next chunk while the current one is consumed,
+      the ufs is then read from a background thread so only enable it for ufs which tolerate that
+    '''
+    if mode.strip('bt') != 'r': self._forget()
+    binary = 'b' in mode
+    if not binary:
+      if buffering == 0: raise ValueError("can't have unbuffered text I/O")
+      if mode.endswith('+'): mode = mode[:-1] + 'b+'
+      else: mode = mode + 'b'
+      if type(newline) == bytes: newline = newline.decode(encoding)
+    buffer_size = self._ufs.CHUNK_SIZE if buffering in (-1, 1) else buffering
+    raw = UPathBinaryIO(self._ufs, self._ufs.open(self._path, mode), mode, readahead=readahead and buffering != 0)
+    if newline not in _io_newlines:
+      # the stdlib buffers only split lines on \n, fallback to our own for anything else
+      if binary: return BufferedBinaryIO(raw, chunk_size=buffer_size or self._ufs.CHUNK_SIZE, newline=newline, writeback=buffering != 0)
+      else: return BufferedIO(raw, chunk_size=buffer_size, encoding=encoding, newline=newline)
+    if buffering == 0: return raw
+    if '+' in mode: buffered = io.BufferedRandom(raw, buffer_size=buffer_size)
+    elif 'r' in mode: buffered = io.BufferedReader(raw, buffer_size=buffer_size)
+    else: buffered = io.BufferedWriter(raw, buffer_size=buffer_size)
+    if binary: return buffered
+    return io.TextIOWrapper(buffered, encoding=encoding, newline=newline, line_buffering=buffering == 1)
 
   def unlink(self):
+    self._forget()
     self._ufs.unlink(self._path)
 
   def mkdir(self, parents=False, exist_ok=False):
     try:
-      if parents:
-        if self != self.parent and not self.parent.exists():
-          self.parent.mkdir(parents=True)
-      self._ufs.mkdir(self._path)
+      self._forget()
+      try:
+        self._ufs.mkdir(self._path)
+      except FileNotFoundError:
+        if not parents: raise
+        # walk up to the closest ancestor that exists, then create the rest on the way back down
+        missing, parent = [], self._path.parent
+        while parent != parent.parent and not self._derive(parent).exists():
+          missing.append(parent)
+          parent = parent.parent
+        for parent in reversed(missing):
+          self._forget(parent)
+          try: self._ufs.mkdir(parent)
+          except FileExistsError: pass
+        self._ufs.mkdir(self._path)
     except FileExistsError as e:
       if not exist_ok: raise e
 
   def rmdir(self):
+    self._forget(subtree=True)
     self._ufs.rmdir(self._path)
 
   def rename(self, other: str):
     if str(other).startswith('/'):
-      self._ufs.rename(self._path, SafePurePosixPath(other))
+      dst = SafePurePosixPath(other)
     else:
-      self._ufs.rename(self._path, self._path.parent/other)
+      dst = self._path.parent/other
+    self._forget(subtree=True)
+    self._forget(dst, subtree=True)
+    self._ufs.rename(self._path, dst)
 
   def iterdir(self):
     for name in self._ufs.ls(self._path):
@@ -106,10 +209,10 @@ class UPath:
     return data
 
   def write_bytes(self, text: bytes) -> int:
-    fd = self._ufs.open(self._path, 'wb', size_hint=len(text))
-    ret = self._ufs.write(fd, text)
-    self._ufs.close(fd)
-    return ret
+    self._forget()
+    # a single put lets atomic stores upload directly rather than streaming through a descriptor
+    self._ufs.put(self._path, (text,), size_hint=len(text))
+    return len(text)
 
   def read_text(self, encoding='utf-8'):
     return self.read_bytes().decode(encoding)
@@ -118,42 +221,168 @@ class UPath:
     return self.write_bytes(text.encode(encoding))
 
   def rglob(self, pattern, *, case_sensitive=False):
-    import fnmatch; _fnmatch = fnmatch.fnmatchcase if case_sensitive else fnmatch.fnmatch
+    match = _compile_glob(pattern, case_sensitive)
     if self.is_dir():
-      Q = [p for p in self.iterdir()]
+      # breadth first, ls_detail gets the types along with the names, in bulk where the ufs supports it
+      Q = collections.deque([self._path])
       while Q:
-        path = Q.pop()
-        if path.is_file():
-          if _fnmatch(path.name, pattern):
-            yield path
-        elif path.is_dir():
-          if _fnmatch(path.name, pattern):
-            yield path
-          Q += [p for p in path.iterdir()]
-
-class UPathBinaryIO(RawBinaryIO):
-  def __init__(self, ufs: UFS, fd: int):
+        path = Q.popleft()
+        for name, info in self._ufs.ls_detail(path).items():
+          if self._info_cache is not None: self._info_cache.set(path / name, Result(val=info), self._info_ttl)
+          if info['type'] == 'directory': Q.append(path / name)
+          elif info['type'] != 'file': continue
+          if match(name):
+            yield self._derive(path / name)
+
+_readahead_executor = None
+
+def readahead_executor():
+  ''' A thread pool shared by every file reading ahead
+  '''
+  global _readahead_executor
+  if _readahead_executor is None:
+    from concurrent.futures import ThreadPoolExecutor
+    _readahead_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ufs-readahead')
+  return _readahead_executor
+
+class UPathBinaryIO(io.RawIOBase):
+  ''' A raw `io` stream over a ufs file descriptor, buffering is left to the C implemented `io` buffers
+
+  :params readahead: For files opened read-only, fetch the next chunk in the background while the current one is consumed
+  '''
+  def __init__(self, ufs: UFS, fd: int, mode: str = 'rb+', readahead: bool = False):
+    super().__init__()
     self._ufs = ufs
     self._fd = fd
+    self._mode = mode
+    self._pos = 0
+    self._readahead = readahead and not self.writable()
+    # what we've read from the ufs but not yet returned, the fd is past all of it
+    self._ahead = memoryview(b'')
+    self._pending = None
+
+  def _fetch(self):
+    return self._ufs.read(self._fd, self._ufs.CHUNK_SIZE)
+
+  def _discard_ahead(self):
+    if self._pending is not None:
+      try: self._pending.result()
+      except Exception: pass
+      self._pending = None
+    self._ahead = memoryview(b'')
+
+  def readable(self):
+    return 'r' in self._mode or '+' in self._mode
+  def writable(self):
+    return 'r' not in self._mode or '+' in self._mode
+  def seekable(self):
+    return True
   def seek(self, amnt: int, whence: int = 0):
-    return self._ufs.seek(self._fd, amnt, whence)
-  def read(self, amnt: int = -1) -> bytes:
-    return self._ufs.read(self._fd, amnt)
+    # not every ufs supports relative seeks, but we know where we are
+    if whence == 1: amnt, whence = self._pos + amnt, 0
+    self._discard_ahead()
+    pos = self._ufs.seek(self._fd, amnt, whence)
+    self._pos = amnt if whence == 0 else pos
+    return self._pos
+  def tell(self):
+    return self._pos
+  def readinto(self, buffer) -> int:
+    buffer = memoryview(buffer).cast('B')
+    if not self._readahead:
+      # straight into the io buffer, no intermediate bytes where the ufs supports it
+      n = self._ufs.readinto(self._fd, buffer)
+      self._pos += n
+      return n
+    if not self._ahead:
+      if self._pending is not None:
+        pending, self._pending = self._pending, None
+        self._ahead = memoryview(pending.result())
+      else:
+        self._ahead = memoryview(self._fetch())
+      # a full chunk suggests there's more to come, small files never read ahead
+      if len(self._ahead) == self._ufs.CHUNK_SIZE:
+        self._pending = readahead_executor().submit(self._fetch)
+    data, self._ahead = self._ahead[:len(buffer)], self._ahead[len(buffer):]
+    n = len(data)
+    buffer[:n] = data
+    self._pos += n
+    return n
+  def readall(self) -> bytes:
+    data = bytearray(self._ahead)
+    if self._pending is not None: data += self._pending.result()
+    self._ahead, self._pending = memoryview(b''), None
+    data += self._ufs.read(self._fd, -1)
+    self._pos += len(data)
+    return bytes(data)
   def write(self, data: bytes) -> int:
-    return self._ufs.write(self._fd, data)
+    # the io buffers hand us memoryviews which not every ufs can take (e.g. to pickle)
+    ret = self._ufs.write(self._fd, bytes(data))
+    self._pos += ret
+    return ret
   def flush(self):
-    self._ufs.flush(self._fd)
-  def truncate(self, length: int):
+    if not self.closed: self._ufs.flush(self._fd)
+  def truncate(self, length: int = None):
+    if length is None: length = self._pos
     self._ufs.truncate(self._fd, length)
+    return length
   def close(self):
-    self._ufs.close(self._fd)
+    if self.closed: return
+    try:
+      super().close()
+    finally:
+      self._discard_ahead()
+      self._ufs.close(self._fd)
 
 class AsyncUPath:
   ''' A class implementing `pathlib.Path` methods for a `ufs`
+
+  :params info_ttl: Seconds to cache info (existence & type) for, the cache is shared by all the AsyncUPaths of a ufs
+  :params negative_ttl: Seconds to remember that a path doesn't exist for, defaults to info_ttl
   '''
-  def __init__(self, ufs: AsyncUFS, path: PathLike = '/') -> None:
+  __slots__ = ('_ufs', '_path', '_info_ttl', '_negative_ttl', '_info_cache')
+
+  def __init__(self, ufs: AsyncUFS, path: PathLike = '/', *, info_ttl: float = 0, negative_ttl: float = None) -> None:
     self._ufs = ufs
     self._path = SafePurePosixPath(path)
+    self._info_ttl = info_ttl
+    self._negative_ttl = info_ttl if negative_ttl is None else negative_ttl
+    self._info_cache = shared_info_cache(ufs) if info_ttl or negative_ttl else None
+
+  def _derive(self, path: SafePurePosixPath):
+    upath = self.__class__(self._ufs, path)
+    upath._info_ttl = self._info_ttl
+    upath._negative_ttl = self._negative_ttl
+    upath._info_cache = self._info_cache
+    return upath
+
+  async def _info(self):
+    if self._info_cache is None: return await self._ufs.info(self._path)
+    try:
+      item = self._info_cache[self._path]
+    except KeyError:
+      try:
+        item = Result(val=await self._ufs.info(self._path))
+      except Exception as err:
+        item = Result(err=err)
+        self._info_cache.set(self._path, item, self._negative_ttl)
+      else:
+        self._info_cache.set(self._path, item, self._info_ttl)
+    if item.err is not None: raise item.err
+    return item.val
+
+  def _forget(self, path: SafePurePosixPath = None, subtree: bool = False):
+    # even when we're not caching, other paths of this ufs might be
+    info_cache = self._info_cache if self._info_cache is not None else _info_caches.get(self._ufs)
+    if info_cache is None: return
+    if path is None: path = self._path
+    if subtree: info_cache.discard_prefix(path)
+    else: info_cache.discard(path)
+    info_cache.discard(path.parent)
+
+  def forget_subtree(self):
+    ''' Drop any cached info for this path and everything under it
+    '''
+    self._forget(subtree=True)
 
   @property
   def name(self):
@@ -165,7 +394,7 @@ class AsyncUPath:
 
   @property
   def parent(self):
-    return AsyncUPath(self._ufs, self._path.parent)
+    return self._derive(self._path.parent)
 
   def __str__(self):
     return str(self._path)
@@ -180,64 +409,87 @@ class AsyncUPath:
     return self._ufs is other._ufs and self._path == other._path
 
   def __truediv__(self, subpath: PathLike):
-    return self.__class__(self._ufs, self._path / subpath)
+    return self._derive(self._path / subpath)
 
   async def exists(self):
     try:
-      await self._ufs.info(self._path)
+      await self._info()
       return True
     except FileNotFoundError:
       return False
 
   async def is_file(self):
     try:
-      return (await self._ufs.info(self._path)['type']) == 'file'
+      return (await self._info())['type'] == 'file'
     except FileNotFoundError:
       return False
 
   async def is_dir(self):
     try:
-      return (await self._ufs.info(self._path)['type']) == 'directory'
+      return (await self._info())['type'] == 'directory'
     except FileNotFoundError:
       return False
 
-  async def open(self, mode: str, encoding='utf-8', newline=b'\n'):
+  async def open(self, mode: str, encoding='utf-8', newline=b'\n', buffering=-1):
+    ''' :params buffering: -1 coalesces writes up to the ufs's CHUNK_SIZE, 0 passes them straight through,
+    anything greater than 1 is the buffer size
+    '''
+    if mode.strip('bt') != 'r': self._forget()
+    chunk_size = buffering if buffering > 1 else self._ufs.CHUNK_SIZE
     if 'b' in mode:
       return AsyncBufferedBinaryIO(
         AsyncUPathBinaryIO(self._ufs, await self._ufs.open(self._path, mode)),
-        chunk_size=self._ufs.CHUNK_SIZE,
+        chunk_size=chunk_size,
         newline=newline,
+        writeback=buffering != 0,
       )
     else:
       if mode.endswith('+'): mode_ = mode[:-1] + 'b+'
       else: mode_ = mode + 'b'
       return AsyncBufferedIO(
         AsyncUPathBinaryIO(self._ufs, await self._ufs.open(self._path, mode_)),
-        chunk_size=self._ufs.CHUNK_SIZE,
+        chunk_size=chunk_size,
         encoding=encoding,
         newline=newline,
+        writeback=buffering != 0,
       )
 
   async def unlink(self):
+    self._forget()
     await self._ufs.unlink(self._path)
 
   async def mkdir(self, parents=False, exist_ok=False):
     try:
-      if parents:
-        if self != self.parent and not await self.parent.exists():
-          await self.parent.mkdir(parents=True)
-      await self._ufs.mkdir(self._path)
+      self._forget()
+      try:
+        await self._ufs.mkdir(self._path)
+      except FileNotFoundError:
+        if not parents: raise
+        # walk up to the closest ancestor that exists, then create the rest on the way back down
+        missing, parent = [], self._path.parent
+        while parent != parent.parent and not await self._derive(parent).exists():
+          missing.append(parent)
+          parent = parent.parent
+        for parent in reversed(missing):
+          self._forget(parent)
+          try: await self._ufs.mkdir(parent)
+          except FileExistsError: pass
+        await self._ufs.mkdir(self._path)
     except FileExistsError as e:
       if not exist_ok: raise e
 
   async def rmdir(self):
+    self._forget(subtree=True)
     await self._ufs.rmdir(self._path)
 
   async def rename(self, other: str):
     if str(other).startswith('/'):
-      await self._ufs.rename(self._path, SafePurePosixPath(other))
+      dst = SafePurePosixPath(other)
     else:
-      await self._ufs.rename(self._path, self._path.parent/other)
+      dst = self._path.parent/other
+    self._forget(subtree=True)
+    self._forget(dst, subtree=True)
+    await self._ufs.rename(self._path, dst)
 
   async def iterdir(self):
     for name in await self._ufs.ls(self._path):
@@ -250,10 +502,12 @@ class AsyncUPath:
     return data
 
   async def write_bytes(self, text: bytes) -> int:
-    fd = await self._ufs.open(self._path, 'wb', size_hint=len(text))
-    ret = await self._ufs.write(fd, text)
-    await self._ufs.close(fd)
-    return ret
+    self._forget()
+    # a single put lets atomic stores upload directly rather than streaming through a descriptor
+    async def data():
+      yield text
+    await self._ufs.put(self._path, data(), size_hint=len(text))
+    return len(text)
 
   async def read_text(self, encoding='utf-8'):
     return (await self.read_bytes()).decode(encoding)
@@ -262,21 +516,22 @@ class AsyncUPath:
     return await self.write_bytes(text.encode(encoding))
 
   async def rglob(self, pattern, *, case_sensitive=False):
-    import fnmatch; _fnmatch = fnmatch.fnmatchcase if case_sensitive else fnmatch.fnmatch
+    match = _compile_glob(pattern, case_sensitive)
     if await self.is_dir():
-      Q = [p async for p in self.iterdir()]
+      # breadth first, ls_detail gets the types along with the names, in bulk where the ufs supports it
+      Q = collections.deque([self._path])
       while Q:
-        path = Q.pop()
-        if await path.is_file():
-          if _fnmatch(path.name, pattern):
-            yield path
-        elif await path.is_dir():
-          if _fnmatch(path.name, pattern):
-            yield path
-          Q += [p async for p in path.iterdir()]
+        path = Q.popleft()
+        for name, info in (await self._ufs.ls_detail(path)).items():
+          if self._info_cache is not None: self._info_cache.set(path / name, Result(val=info), self._info_ttl)
+          if info['type'] == 'directory': Q.append(path / name)
+          elif info['type'] != 'file': continue
+          if match(name):
+            yield self._derive(path / name)
 
 
 class AsyncUPathBinaryIO(AsyncRawBinaryIO):
+  __slots__ = ('_ufs', '_fd')
   def __init__(self, ufs: AsyncUFS, fd: int):
     self._ufs = ufs
     self._fd = fd
@@ -64,10 +64,8 @@ class USFTPHandle(paramiko.SFTPHandle):
       raise
   def write(self, offset, data):
     try:
-      seek_ret = self.server._uos.lseek(self.fd, offset)
-      logger.error(f"-> {seek_ret}")
-      write_ret = self.server._uos.write(self.fd, data)
-      logger.error(f"-> {write_ret}")
+      self.server._uos.lseek(self.fd, offset)
+      self.server._uos.write(self.fd, data)
     except OSError as e:
       return paramiko.SFTPServer.convert_errno(e.errno)
     except:
@@ -98,13 +96,10 @@ class USFTPServer(paramiko.SFTPServerInterface):
   def list_folder(self, path):
     try:
       ret = [
-        paramiko.SFTPAttributes.from_stat(
-          self._server._uos.stat(path + '/' + fname),
-          fname,
-        )
-        for fname in self._server._uos.listdir(path)
+        paramiko.SFTPAttributes.from_stat(stat, fname)
+        for fname, stat in self._server._uos.listdir_stat(path)
       ]
-      logger.error(f"list_folder {ret}")
+      if logger.isEnabledFor(logging.DEBUG): logger.debug(f"list_folder {ret}")
       return ret
     except OSError as e:
       return paramiko.SFTPServer.convert_errno(e.errno)
@@ -126,7 +121,7 @@ class USFTPServer(paramiko.SFTPServerInterface):
   lstat = stat
 
   def open(self, path, flags, attr):
-    logger.error('USFTP Server open')
+    if logger.isEnabledFor(logging.DEBUG): logger.debug(f"open {path}")
     try:
       binary_flag = getattr(os, 'O_BINARY',  0)
       flags |= binary_flag
@@ -190,18 +185,22 @@ class USFTPServer(paramiko.SFTPServerInterface):
 
 def ufs_via_sftp(ufs: dict, host: str, port: int, username: str, password: str = None, keyfile: str = None, BACKLOG = 10):
   import socket
+  from concurrent.futures import ThreadPoolExecutor
+  from ufs.utils.socket import tune_socket
   if keyfile is None: keyfile = str(pathlib.Path('~/.ssh/id_rsa').expanduser())
   with UFS.from_dict(**ufs) as ufs:
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, True)
+    tune_socket(server_socket, nodelay=False)
     server_socket.bind((host, port))
     server_socket.listen(BACKLOG)
     server = USSHServer(ufs, username, password)
+    host_key = paramiko.RSAKey.from_private_key_file(keyfile)
     connections = []
 
-    while True:
-      conn, addr = server_socket.accept()
-      host_key = paramiko.RSAKey.from_private_key_file(keyfile)
+    def handle(conn, addr):
+      # negotiating ssh takes a while, doing it here lets the accept loop get back to accepting
+      tune_socket(conn, buffer_size=None)
       transport = paramiko.Transport(conn)
       transport.add_server_key(host_key)
       transport.set_subsystem_handler(
@@ -211,11 +210,13 @@ def ufs_via_sftp(ufs: dict, host: str, port: int, username: str, password: str =
         transport.start_server(server=server)
         channel = transport.accept()
         connections.append((conn, addr, transport, channel))
-      except KeyboardInterrupt:
-        raise
       except:
-        logger.error(traceback.print_exc())
-        continue
+        logger.error(traceback.format_exc())
+
+    with ThreadPoolExecutor(max_workers=BACKLOG, thread_name_prefix='ufs-sftp') as executor:
+      while True:
+        conn, addr = server_socket.accept()
+        executor.submit(handle, conn, addr)
 
 @contextlib.contextmanager
 def serve_ufs_via_sftp(ufs: UFS, host: str, port: int, username: str, password: str = None, keyfile: str = None, BACKLOG = 10):
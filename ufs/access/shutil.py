@@ -1,5 +1,8 @@
 ''' shutil-style high level file ops between UFS stores
 '''
+import os
+import asyncio
+import collections
 from ufs.spec import UFS, AsyncUFS
 from ufs.utils.pathlib import SafePurePosixPath_, coerce_pathlike
 
@@ -13,15 +16,14 @@ def walk(ufs: UFS, path: SafePurePosixPath_, dirfirst=True):
   '''
   info = ufs.info(path)
   if info['type'] == 'directory':
-    Q = []
+    Q = collections.deque()
     if dirfirst:
       yield path, info
     else:
-      Q += [(path, True)]
-    Q += [(path/p, False) for p in ufs.ls(path)]
+      Q.append((path, info, True))
+    Q.extend((path/p, i, False) for p, i in (ufs.ls_detail(path)).items())
     while Q:
-      p, empty = Q.pop()
-      i = ufs.info(p)
+      p, i, empty = Q.pop()
       if i['type'] == 'file':
         yield p, i
       elif i['type'] == 'directory':
@@ -31,55 +33,169 @@ def walk(ufs: UFS, path: SafePurePosixPath_, dirfirst=True):
           if dirfirst:
             yield p, i
           else:
-            Q += [(p, True)]
-          Q += [(p/pp, False) for pp in ufs.ls(p)]
+            Q.append((p, i, True))
+          Q.extend((p/pp, ii, False) for pp, ii in (ufs.ls_detail(p)).items())
   else:
     yield path, info
 
 @coerce_pathlike
-async def async_walk(ufs: AsyncUFS, path: SafePurePosixPath_, dirfirst=True):
+async def async_walk(ufs: AsyncUFS, path: SafePurePosixPath_, dirfirst=True, max_concurrency=32):
   '''
   :params dirfirst: Controls whether the directories are yielded before or after the files in the directory
+  :params max_concurrency: How many directories to list at once, subdirectories are listed ahead of
+    being reached so remote stores aren't walked one round trip at a time
 
   dirfirst=True: / /a/ /a/b /a/c ...
   dirfirst=False: ... /a/b /a/c /a/ /
   '''
   info = await ufs.info(path)
   if info['type'] == 'directory':
-    Q = []
-    if dirfirst:
-      yield path, info
-    else:
-      Q += [(path, True)]
-    Q += [(path/p, False) for p in await ufs.ls(path)]
-    while Q:
-      p, empty = Q.pop()
-      i = await ufs.info(p)
-      if i['type'] == 'file':
-        yield p, i
-      elif i['type'] == 'directory':
-        if empty:
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async def ls_detail(p):
+      async with semaphore:
+        return await ufs.ls_detail(p)
+    def entries(p, listing):
+      return (
+        (p/pp, ii, False, asyncio.ensure_future(ls_detail(p/pp)) if ii['type'] == 'directory' else None)
+        for pp, ii in listing.items()
+      )
+    Q = collections.deque()
+    try:
+      if dirfirst:
+        yield path, info
+      else:
+        Q.append((path, info, True, None))
+      Q.extend(entries(path, await ufs.ls_detail(path)))
+      while Q:
+        p, i, empty, listing = Q.pop()
+        if i['type'] == 'file':
           yield p, i
-        else:
-          if dirfirst:
+        elif i['type'] == 'directory':
+          if empty:
             yield p, i
           else:
-            Q += [(p, True)]
-          Q += [(p/pp, False) for pp in await ufs.ls(p)]
+            if dirfirst:
+              yield p, i
+            else:
+              Q.append((p, i, True, None))
+            Q.extend(entries(p, await listing))
+    finally:
+      for _, _, _, listing in Q:
+        if listing is not None: listing.cancel()
   else:
     yield path, info
 
+def _fileno(ufs: UFS, fd: int):
+  try:
+    return ufs.fileno(fd)
+  except (AttributeError, NotImplementedError):
+    return None
+
+def _sendfile(src_fileno: int, dst_fileno: int, size: int) -> bool:
+  ''' Copy between os-level files in the kernel, returns False if that's not possible here
+  '''
+  if not hasattr(os, 'sendfile'): return False
+  offset = 0
+  while True:
+    try:
+      sent = os.sendfile(dst_fileno, src_fileno, offset, max(size - offset, 1<<20))
+    except OSError:
+      # older kernels & some platforms can't sendfile to a regular file
+      if offset == 0: return False
+      raise
+    if not sent: return True
+    offset += sent
+
+COPY_CHUNK_SIZE = 1<<20
+COPY_READAHEAD = 4
+
+def _read_chunks(ufs: UFS, fd: int, size: int, readahead: bool = False):
+  ''' Yield the chunks of fd, with readahead files larger than a chunk are read in a background thread
+  so the source's read latency overlaps with whatever the caller does with each chunk
+  '''
+  chunk_size = max(ufs.CHUNK_SIZE, COPY_CHUNK_SIZE)
+  if not readahead or size <= chunk_size:
+    while True:
+      buf = ufs.read(fd, chunk_size)
+      if not buf: break
+      yield buf
+    return
+  import queue, threading
+  Q, stop = queue.Queue(maxsize=COPY_READAHEAD), threading.Event()
+  def producer():
+    try:
+      while not stop.is_set():
+        buf = ufs.read(fd, chunk_size)
+        Q.put((buf, None))
+        if not buf: break
+    except Exception as err:
+      Q.put((None, err))
+  thread = threading.Thread(target=producer, daemon=True)
+  thread.start()
+  try:
+    while True:
+      buf, err = Q.get()
+      if err is not None: raise err
+      if not buf: break
+      yield buf
+  finally:
+    # unblock the producer if we stopped early, it must be done with fd before it's closed
+    stop.set()
+    while thread.is_alive():
+      try: Q.get(timeout=0.1)
+      except queue.Empty: pass
+
+async def _async_read_chunks(ufs: AsyncUFS, fd: int, size: int):
+  ''' Yield the chunks of fd, files larger than a chunk are read ahead in a separate task
+  so the source's read latency overlaps with whatever the caller does with each chunk
+  '''
+  chunk_size = max(ufs.CHUNK_SIZE, COPY_CHUNK_SIZE)
+  if size <= chunk_size:
+    while True:
+      buf = await ufs.read(fd, chunk_size)
+      if not buf: break
+      yield buf
+    return
+  Q = asyncio.Queue(maxsize=COPY_READAHEAD)
+  async def producer():
+    try:
+      while True:
+        buf = await ufs.read(fd, chunk_size)
+        await Q.put((buf, None))
+        if not buf: break
+    except Exception as err:
+      await Q.put((None, err))
+  task = asyncio.ensure_future(producer())
+  try:
+    while True:
+      buf, err = await Q.get()
+      if err is not None: raise err
+      if not buf: break
+      yield buf
+  finally:
+    if not task.done():
+      task.cancel()
+      try: await task
+      except asyncio.CancelledError: pass
+
 @coerce_pathlike
-def copyfile(src_ufs: UFS, src_path: SafePurePosixPath_, dst_ufs: UFS, dst_path: SafePurePosixPath_):
+def copyfile(src_ufs: UFS, src_path: SafePurePosixPath_, dst_ufs: UFS, dst_path: SafePurePosixPath_, readahead: bool = False):
+  ''' :params readahead: Read the source in a background thread while writing to the destination,
+    only enable it for a src_ufs which tolerates being called from another thread
+  '''
   if src_ufs is dst_ufs:
     src_ufs.copy(src_path, dst_path)
   else:
     src_info = src_ufs.info(src_path)
     src_fd = src_ufs.open(src_path, 'rb')
     dst_fd = dst_ufs.open(dst_path, 'wb', size_hint=src_info['size'])
-    while True:
-      buf = src_ufs.read(src_fd, src_ufs.CHUNK_SIZE)
-      if not buf: break
+    # both sides are local files, skip the round trip through python bytes
+    src_fileno, dst_fileno = _fileno(src_ufs, src_fd), _fileno(dst_ufs, dst_fd)
+    if src_fileno is not None and dst_fileno is not None and _sendfile(src_fileno, dst_fileno, src_info['size']):
+      dst_ufs.close(dst_fd)
+      src_ufs.close(src_fd)
+      return
+    for buf in _read_chunks(src_ufs, src_fd, src_info['size'], readahead=readahead):
       dst_ufs.write(dst_fd, buf)
     dst_ufs.close(dst_fd)
     src_ufs.close(src_fd)
@@ -92,17 +208,21 @@ async def async_copyfile(src_ufs: AsyncUFS, src_path: SafePurePosixPath_, dst_uf
     src_info = await src_ufs.info(src_path)
     src_fd = await src_ufs.open(src_path, 'rb')
     dst_fd = await dst_ufs.open(dst_path, 'wb', size_hint=src_info['size'])
-    while True:
-      buf = await src_ufs.read(src_fd, src_ufs.CHUNK_SIZE)
-      if not buf: break
+    async for buf in _async_read_chunks(src_ufs, src_fd, src_info['size']):
       await dst_ufs.write(dst_fd, buf)
     await dst_ufs.close(dst_fd)
     await src_ufs.close(src_fd)
 
+def _is_within(path: SafePurePosixPath_, parent: SafePurePosixPath_) -> bool:
+  ''' Whether path is parent or somewhere underneath it
+  '''
+  path, parent = str(path), str(parent).rstrip('/')
+  return path == parent or path.startswith(parent + '/')
+
 @coerce_pathlike
 def movefile(src_ufs: UFS, src_path: SafePurePosixPath_, dst_ufs: UFS, dst_path: SafePurePosixPath_):
   if src_ufs is dst_ufs:
-    if str(src_path) in str(dst_path):
+    if _is_within(dst_path, src_path):
       raise RuntimeError("Can't move path into itself")
     src_ufs.rename(src_path, dst_path)
   else:
@@ -112,7 +232,7 @@ def movefile(src_ufs: UFS, src_path: SafePurePosixPath_, dst_ufs: UFS, dst_path:
 @coerce_pathlike
 async def async_movefile(src_ufs: AsyncUFS, src_path: SafePurePosixPath_, dst_ufs: UFS, dst_path: SafePurePosixPath_):
   if src_ufs is dst_ufs:
-    if str(src_path) in str(dst_path):
+    if _is_within(dst_path, src_path):
       raise RuntimeError("Can't move path into itself")
     await src_ufs.rename(src_path, dst_path)
   else:
@@ -133,17 +253,55 @@ def copytree(src_ufs: UFS, src_path: SafePurePosixPath_, dst_ufs: UFS, dst_path:
       copyfile(src_ufs, p, dst_ufs, dst_path / rel_path)
 
 @coerce_pathlike
-async def async_copytree(src_ufs: AsyncUFS, src_path: SafePurePosixPath_, dst_ufs: UFS, dst_path: SafePurePosixPath_, exists_ok=False):
-  async for p, i in async_walk(src_ufs, src_path, dirfirst=True):
-    rel_path = p.relative_to(src_path)
-    if i['type'] == 'directory':
-      try:
-        await dst_ufs.mkdir(dst_path / rel_path)
-      except FileExistsError:
-        if not exists_ok:
-          raise
-    elif i['type'] == 'file':
-      await async_copyfile(src_ufs, p, dst_ufs, dst_path / rel_path)
+def copytree_parallel(src_ufs: UFS, src_path: SafePurePosixPath_, dst_ufs: UFS, dst_path: SafePurePosixPath_, exists_ok=False, max_workers=None):
+  ''' Like copytree but files are copied concurrently in a thread pool,
+  directories are still created serially as they're encountered (parents first).
+  Both ufs are called from several threads at once so they must tolerate that.
+
+  :params max_workers: The number of files copied at once, 1 falls back to copytree
+  '''
+  if max_workers == 1: return copytree(src_ufs, src_path, dst_ufs, dst_path, exists_ok=exists_ok)
+  from concurrent.futures import ThreadPoolExecutor
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    futures = []
+    for p, i in walk(src_ufs, src_path, dirfirst=True):
+      rel_path = p.relative_to(src_path)
+      if i['type'] == 'directory':
+        try:
+          dst_ufs.mkdir(dst_path / rel_path)
+        except FileExistsError:
+          if not exists_ok:
+            raise
+      elif i['type'] == 'file':
+        futures.append(executor.submit(copyfile, src_ufs, p, dst_ufs, dst_path / rel_path))
+    for future in futures:
+      future.result()
+
+@coerce_pathlike
+async def async_copytree(src_ufs: AsyncUFS, src_path: SafePurePosixPath_, dst_ufs: UFS, dst_path: SafePurePosixPath_, exists_ok=False, max_concurrency=8):
+  ''' Directories are created as they're encountered (parents first), files are copied concurrently
+
+  :params max_concurrency: How many files to copy at once
+  '''
+  semaphore = asyncio.Semaphore(max_concurrency)
+  async def copyfile(src, dst):
+    async with semaphore:
+      await async_copyfile(src_ufs, src, dst_ufs, dst)
+  tasks = []
+  try:
+    async for p, i in async_walk(src_ufs, src_path, dirfirst=True):
+      rel_path = p.relative_to(src_path)
+      if i['type'] == 'directory':
+        try:
+          await dst_ufs.mkdir(dst_path / rel_path)
+        except FileExistsError:
+          if not exists_ok:
+            raise
+      elif i['type'] == 'file':
+        tasks.append(asyncio.ensure_future(copyfile(p, dst_path / rel_path)))
+    await asyncio.gather(*tasks)
+  finally:
+    for task in tasks: task.cancel()
 
 @coerce_pathlike
 def copy(src_ufs: UFS, src_path: SafePurePosixPath_, dst_ufs: UFS, dst_path: SafePurePosixPath_):
@@ -191,14 +349,14 @@ async def async_rmtree(ufs: AsyncUFS, path: SafePurePosixPath_):
 
 @coerce_pathlike
 def move(src_ufs: UFS, src_path: SafePurePosixPath_, dst_ufs: UFS, dst_path: SafePurePosixPath_):
-  if src_ufs is dst_ufs and str(src_path) in str(dst_path):
+  if src_ufs is dst_ufs and _is_within(dst_path, src_path):
     raise RuntimeError("Can't move path into itself")
   copy(src_ufs, src_path, dst_ufs, dst_path)
   rmtree(src_ufs, src_path)
 
 @coerce_pathlike
 async def async_move(src_ufs: AsyncUFS, src_path: SafePurePosixPath_, dst_ufs: UFS, dst_path: SafePurePosixPath_):
-  if src_ufs is dst_ufs and str(src_path) in str(dst_path):
+  if src_ufs is dst_ufs and _is_within(dst_path, src_path):
     raise RuntimeError("Can't move path into itself")
   await async_copy(src_ufs, src_path, dst_ufs, dst_path)
   await async_rmtree(src_ufs, src_path)
@@ -1,9 +1,17 @@
 ''' url-style access for UFS, similar to fsspec's urls but all backed by UFS
 '''
+import functools
+import importlib
 import contextlib
 from ufs.utils.url import parse_url, parse_netloc, parse_fragment_qs
 from ufs.utils.pathlib import SafePurePosixPath
 
+@functools.lru_cache(maxsize=None)
+def _import(module: str, attr: str):
+  ''' Resolve an implementation the first time a url needs it, then skip the import machinery
+  '''
+  return getattr(importlib.import_module(module), attr)
+
 protos = {}
 def register_proto_handler(proto):
   def decorator(func):
@@ -14,45 +22,45 @@ def register_proto_handler(proto):
 @register_proto_handler(None)
 @register_proto_handler('file')
 def proto_file(url):
-  from ufs.impl.local import Local
-  from ufs.impl.prefix import Prefix
+  Local = _import('ufs.impl.local', 'Local')
+  Prefix = _import('ufs.impl.prefix', 'Prefix')
   return Prefix(Local(), url['path'])
 
 @register_proto_handler('memory')
 def proto_memory(url):
-  from ufs.impl.memory import Memory
-  from ufs.impl.prefix import Prefix
+  Memory = _import('ufs.impl.memory', 'Memory')
+  Prefix = _import('ufs.impl.prefix', 'Prefix')
   return Prefix(Memory(), url['path'])
 
 @register_proto_handler('tmp')
 def proto_tmp(url):
-  from ufs.impl.tempdir import TemporaryDirectory
+  TemporaryDirectory = _import('ufs.impl.tempdir', 'TemporaryDirectory')
   return TemporaryDirectory()
 
 @register_proto_handler('rclone')
 def proto_rclone(url):
-  from ufs.impl.rclone import RClone
-  from ufs.impl.prefix import Prefix
+  RClone = _import('ufs.impl.rclone', 'RClone')
+  Prefix = _import('ufs.impl.prefix', 'Prefix')
   return Prefix(RClone(**parse_fragment_qs(url)), url['path'])
 
 @register_proto_handler('s3')
 def proto_s3(url):
-  from ufs.impl.s3 import S3
-  from ufs.impl.prefix import Prefix
+  S3 = _import('ufs.impl.s3', 'S3')
+  Prefix = _import('ufs.impl.prefix', 'Prefix')
   return Prefix(S3(**parse_fragment_qs(url)), url['path'])
 
 @register_proto_handler('sbfs')
 def proto_sbfs(url):
-  from ufs.impl.prefix import Prefix
-  from ufs.impl.sbfs import SBFS
-  from ufs.impl.sync import Sync
+  Prefix = _import('ufs.impl.prefix', 'Prefix')
+  SBFS = _import('ufs.impl.sbfs', 'SBFS')
+  Sync = _import('ufs.impl.sync', 'Sync')
   return Prefix(Sync(SBFS(**parse_fragment_qs(url))), url['path'])
 
 @register_proto_handler('ftps')
 @register_proto_handler('ftp')
 def proto_ftp(url):
-  from ufs.impl.ftp import FTP
-  from ufs.impl.prefix import Prefix
+  FTP = _import('ufs.impl.ftp', 'FTP')
+  Prefix = _import('ufs.impl.prefix', 'Prefix')
   netloc_parsed = parse_netloc(url)
   return Prefix(
     FTP(
@@ -69,8 +77,8 @@ def proto_ftp(url):
 @register_proto_handler('https')
 @register_proto_handler('http')
 def proto_http(url):
-  from ufs.impl.http import HTTP
-  from ufs.impl.prefix import Prefix
+  HTTP = _import('ufs.impl.http', 'HTTP')
+  Prefix = _import('ufs.impl.prefix', 'Prefix')
   netloc_parsed = parse_netloc(url)
   return Prefix(
     HTTP(
@@ -83,8 +91,8 @@ def proto_http(url):
 
 @register_proto_handler('sftp')
 def proto_sftp(url):
-  from ufs.impl.sftp import SFTP
-  from ufs.impl.prefix import Prefix
+  SFTP = _import('ufs.impl.sftp', 'SFTP')
+  Prefix = _import('ufs.impl.prefix', 'Prefix')
   netloc_parsed = parse_netloc(url)
   return Prefix(
     SFTP(
@@ -99,8 +107,8 @@ def proto_sftp(url):
 
 @register_proto_handler('drs')
 def proto_drs(url):
-  from ufs.impl.drs import DRS
-  from ufs.impl.prefix import Prefix
+  DRS = _import('ufs.impl.drs', 'DRS')
+  Prefix = _import('ufs.impl.prefix', 'Prefix')
   netloc_parsed = parse_netloc(url)
   opts = dict(scheme='http' if netloc_parsed['port'] else 'https')
   opts.update(parse_fragment_qs(url))
@@ -129,7 +137,7 @@ def ufs_file_from_url(url: str, filename=None, protos=protos):
   :param filename: The filename to use for the file, defaults to the final name component of the path
   :returns: ufs, filename
   '''
-  from ufs.impl.mapper import Mapper
+  Mapper = _import('ufs.impl.mapper', 'Mapper')
   url_parsed = parse_url(url)
   if url_parsed['proto'] not in protos:
     raise NotImplementedError(url_parsed['proto'])
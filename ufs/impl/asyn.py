@@ -1,25 +1,25 @@
 ''' Treat any sync UFS as an AsyncUFS, it runs in a dedicated thread
 '''
+import queue
 import asyncio
 import itertools
 from ufs.spec import UFS, AsyncUFS
 
-def ufs_thread(loop: asyncio.AbstractEventLoop, send: asyncio.PriorityQueue, recv: asyncio.PriorityQueue, ufs_spec):
+def ufs_thread(recv: queue.Queue, reply, ufs_spec):
   ufs = UFS.from_dict(**ufs_spec)
+  # bound methods by op, so they're only looked up once
+  dispatch = {}
   while True:
-    msg = asyncio.run_coroutine_threadsafe(recv.get(), loop).result()
-    i, op, args, kwargs = msg
-    if op is None:
-      recv.task_done()
-      break
+    i, op, args, kwargs = recv.get()
+    if op is None: break
     try:
-      func = getattr(ufs, op)
+      func = dispatch.get(op)
+      if func is None: func = dispatch[op] = getattr(ufs, op)
       res = func(*args, **kwargs)
     except Exception as err:
-      asyncio.run_coroutine_threadsafe(send.put([i, None, err]), loop).result()
+      reply(i, None, err)
     else:
-      asyncio.run_coroutine_threadsafe(send.put([i, res, None]), loop).result()
-    recv.task_done()
+      reply(i, res, None)
 
 class Async(AsyncUFS):
   def __init__(self, ufs: UFS):
@@ -40,17 +40,21 @@ class Async(AsyncUFS):
   
   async def _forward(self, op, *args, **kwargs):
     await self.start()
-    i, i_ = next(self._taskid), None
-    await self._send.put([i, op, args, kwargs])
-    while True:
-      i_, ret, err = await self._recv.get()
-      self._recv.task_done()
-      if i == i_:
-        break
-      # a different result came before ours, add it back to the queue and try again
-      await self._recv.put([i_, ret, err])
-    if err is not None: raise err
-    else: return ret
+    i = next(self._taskid)
+    # the ufs thread resolves this future directly when it has our result
+    self._pending[i] = future = asyncio.get_event_loop().create_future()
+    self._send.put([i, op, args, kwargs])
+    try:
+      return await future
+    finally:
+      self._pending.pop(i, None)
+
+  def _resolve(self, i, ret, err):
+    future = self._pending.pop(i, None)
+    # we may have stopped waiting (e.g. cancelled)
+    if future is None or future.done(): return
+    if err is not None: future.set_exception(err)
+    else: future.set_result(ret)
 
   async def ls(self, path):
     return await self._forward('ls', path)
@@ -86,8 +90,13 @@ class Async(AsyncUFS):
     return await self._forward('rmdir', path)
   async def flush(self, fd):
     return await self._forward('flush', fd)
+  async def presign(self, path, expires = 3600):
+    return await self._forward('presign', path, expires)
 
   # fallback
+  async def ls_detail(self, path):
+    return await self._forward('ls_detail', path)
+
   async def copy(self, src, dst):
     return await self._forward('copy', src, dst)
 
@@ -96,14 +105,15 @@ class Async(AsyncUFS):
 
   async def start(self):
     if not hasattr(self, '_task'):
-      self._send, self._recv = asyncio.PriorityQueue(), asyncio.PriorityQueue()
+      self._send, self._pending = queue.Queue(), {}
       loop = asyncio.get_event_loop()
-      self._task = loop.run_in_executor(None, ufs_thread, loop, self._recv, self._send, self._ufs.to_dict())
+      reply = lambda i, ret, err: loop.call_soon_threadsafe(self._resolve, i, ret, err)
+      self._task = loop.run_in_executor(None, ufs_thread, self._send, reply, self._ufs.to_dict())
       await self._forward('start')
 
   async def stop(self):
     if hasattr(self, '_task'):
       await self._forward('stop')
-      await self._send.put([next(self._taskid), None, None, None])
+      self._send.put([next(self._taskid), None, None, None])
       await self._task
       del self._task
@@ -6,20 +6,30 @@ from ufs.spec import UFS
 from ufs.utils.cache import TTLCache
 
 class DirCache(UFS):
-  def __init__(self, ufs: UFS, ttl=60):
+  ''' Errors (e.g. FileNotFoundError) are cached too, repeatedly probing for paths which
+  don't exist is common and just as expensive as looking up ones which do.
+
+  :params negative_ttl: Seconds to remember errors for, defaults to ttl
+  '''
+  def __init__(self, ufs: UFS, ttl=60, negative_ttl=None):
     super().__init__()
     self._ttl = ttl
+    self._negative_ttl = negative_ttl
     self._ufs = ufs
-    self._ls_cache = TTLCache(resolve=self._ufs.ls, ttl=ttl)
-    self._info_cache = TTLCache(resolve=self._ufs.info, ttl=ttl)
+    self._ls_cache = TTLCache(resolve=self._ufs.ls, ttl=ttl, negative_ttl=negative_ttl)
+    self._info_cache = TTLCache(resolve=self._ufs.info, ttl=ttl, negative_ttl=negative_ttl)
     self._fds = {}
 
   @staticmethod
-  def from_dict(*, ufs, ttl):
-    return DirCache(UFS.from_dict(**ufs), ttl=ttl)
+  def from_dict(*, ufs, ttl, negative_ttl=None):
+    return DirCache(UFS.from_dict(**ufs), ttl=ttl, negative_ttl=negative_ttl)
 
   def to_dict(self):
-    return dict(super().to_dict(), ufs=self._ufs.to_dict(), ttl=self._ttl)
+    return dict(super().to_dict(), ufs=self._ufs.to_dict(), ttl=self._ttl, negative_ttl=self._negative_ttl)
+
+  @property
+  def supports_fork(self):
+    return self._ufs.supports_fork
 
   def ls(self, path):
     return self._ls_cache(path)
@@ -28,6 +38,9 @@ class DirCache(UFS):
     return self._info_cache(path)
 
   def open(self, path, mode, *, size_hint = None):
+    if mode == 'rb':
+      # reading doesn't change anything we've cached
+      return self._ufs.open(path, mode, size_hint=size_hint)
     self._info_cache.discard(path)
     self._ls_cache.discard(path.parent)
     fd = self._ufs.open(path, mode, size_hint=size_hint)
@@ -37,14 +50,17 @@ class DirCache(UFS):
     return self._ufs.seek(fd, pos, whence)
   def read(self, fd, amnt = -1):
     return self._ufs.read(fd, amnt)
+  def readinto(self, fd, buffer):
+    return self._ufs.readinto(fd, buffer)
   def write(self, fd, data: bytes):
     return self._ufs.write(fd, data)
   def truncate(self, fd, length):
     return self._ufs.truncate(fd, length)
   def close(self, fd):
-    path = self._fds.pop(fd)
-    self._info_cache.discard(path)
-    self._ls_cache.discard(path.parent)
+    path = self._fds.pop(fd, None)
+    if path is not None:
+      self._info_cache.discard(path)
+      self._ls_cache.discard(path.parent)
     return self._ufs.close(fd)
   def unlink(self, path):
     self._info_cache.discard(path)
@@ -66,8 +82,17 @@ class DirCache(UFS):
 
   def flush(self, fd):
     return self._ufs.flush(fd)
+  def presign(self, path, expires = 3600):
+    return self._ufs.presign(path, expires)
 
   # fallback
+  def ls_detail(self, path):
+    listing = self._ufs.ls_detail(path)
+    self._ls_cache[path] = list(listing.keys())
+    for name, info in listing.items():
+      self._info_cache[path / name] = info
+    return listing
+
   def copy(self, src, dst):
     self._ufs.copy(src, dst)
     self._info_cache.discard(dst)
@@ -36,7 +36,9 @@ def fsspec_ls(fs, path: str):
     for item in detail
     if pathparent(item['name']) == path
   }
-  import sys; print(path, detail, fs, file=sys.stderr)
+  # listing a file gives back just that file
+  if not ret and any(item['name'] == path and item['type'] != 'directory' for item in detail):
+    raise NotADirectoryError(path)
   return ret
 
 def fsspec_info(fs, path: str):
@@ -69,10 +71,13 @@ class FSSpec(UFS):
     return self._fs.root_marker + str(path)[1:]
 
   def ls(self, path):
+    return list(FSSpec.ls_detail(self, path).keys())
+
+  def ls_detail(self, path):
     listing = self._ls_cache(self._path(path))
-    for p, info in listing.items():
-      self._info_cache[p] = info
-    return list(listing.keys())
+    for name, info in listing.items():
+      self._info_cache[self._path(path / name)] = info
+    return dict(listing)
 
   def info(self, path):
     info = self._info_cache(self._path(path))
@@ -92,6 +97,8 @@ class FSSpec(UFS):
     return self._fds[fd][1].seek(pos, whence)
   def read(self, fd, amnt):
     return self._fds[fd][1].read(amnt)
+  def readinto(self, fd, buffer):
+    return self._fds[fd][1].readinto(buffer)
   def write(self, fd, data):
     return self._fds[fd][1].write(data)
   def truncate(self, fd, length):
@@ -119,6 +126,9 @@ class FSSpec(UFS):
     return self._fs.rmdir(self._path(path))
   def flush(self, fd):
     self._fds[fd][1].flush()
+  def presign(self, path, expires = 3600):
+    try: return self._fs.sign(self._path(path), expiration=expires)
+    except NotImplementedError: return None
 
   def copy(self, src, dst):
     self._fs.copy(self._path(src), self._path(dst))
@@ -47,3 +47,8 @@ class HTTP(DescriptorFromAtomicMixin, UFS):
     elif req.status_code > 299:
       raise RuntimeError(req.status_code)
     yield from req.iter_content(self.CHUNK_SIZE)
+
+  def presign(self, path, expires = 3600):
+    # urls which need our headers can't be handed out
+    if self._headers: return None
+    return self._scheme + '://' + self._netloc + str(path)
@@ -7,7 +7,24 @@ import itertools
 import typing as t
 from ufs.spec import UFS
 
+def stat_to_info(info: os.stat_result):
+  if info.st_mode & stat.S_IFDIR:
+    type = 'directory'
+  elif info.st_mode & stat.S_IFREG:
+    type = 'file'
+  else:
+    raise NotImplementedError()
+  return {
+    'type': type,
+    'size': info.st_size,
+    'atime': info.st_atime,
+    'ctime': info.st_ctime,
+    'mtime': info.st_mtime,
+  }
+
 class Local(UFS):
+  supports_fork = True
+
   def __init__(self):
     super().__init__()
     self._cfd = iter(itertools.count(start=5))
@@ -15,20 +32,7 @@ class Local(UFS):
   def ls(self, path):
     return os.listdir(path.as_path())
   def info(self, path):
-    info = os.stat(path.as_path())
-    if info.st_mode & stat.S_IFDIR:
-      type = 'directory'
-    elif info.st_mode & stat.S_IFREG:
-      type = 'file'
-    else:
-      raise NotImplementedError()
-    return {
-      'type': type,
-      'size': info.st_size,
-      'atime': info.st_atime,
-      'ctime': info.st_ctime,
-      'mtime': info.st_mtime,
-    }
+    return stat_to_info(os.stat(path.as_path()))
   def open(self, path, mode, *, size_hint = None):
     fd = next(self._cfd)
     self._fds[fd] = open(path.as_path(), mode)
@@ -37,6 +41,12 @@ class Local(UFS):
     return self._fds[fd].seek(pos, whence)
   def read(self, fd, amnt = -1):
     return self._fds[fd].read(amnt)
+  def readinto(self, fd, buffer):
+    return self._fds[fd].readinto(buffer)
+  def fileno(self, fd):
+    ''' The os-level file descriptor, used to copy between local files without going through python
+    '''
+    return self._fds[fd].fileno()
   def write(self, fd, data: bytes):
     return self._fds[fd].write(data)
   def truncate(self, fd, length):
@@ -53,6 +63,9 @@ class Local(UFS):
   def flush(self, fd):
     self._fds[fd].flush()
   
+  def ls_detail(self, path):
+    with os.scandir(path.as_path()) as entries:
+      return {entry.name: stat_to_info(entry.stat()) for entry in entries}
   def copy(self, src, dst):
     shutil.copy(src.as_path(), dst.as_path())
   def rename(self, src, dst):
@@ -29,6 +29,10 @@ class Logger(UFS):
       ufs=self._ufs.to_dict(),
     )
 
+  @property
+  def supports_fork(self):
+    return self._ufs.supports_fork
+
   def _call(self, op, *args, **kwargs):
     method = f"{op}({', '.join([*[repr(arg) for arg in args], *[key + '=' + repr(value) for key, value in kwargs.items()]])})"
     try:
@@ -50,6 +54,8 @@ class Logger(UFS):
     return self._call('seek', fd, pos, whence)
   def read(self, fd, amnt):
     return self._call('read', fd, amnt)
+  def readinto(self, fd, buffer):
+    return self._call('readinto', fd, buffer)
   def write(self, fd, data: bytes):
     return self._call('write', fd, data)
   def truncate(self, fd, length):
@@ -66,8 +72,13 @@ class Logger(UFS):
     return self._call('rmdir', path)
   def flush(self, fd):
     return self._call('flush', fd)
+  def presign(self, path, expires = 3600):
+    return self._call('presign', path, expires)
 
   # fallback
+  def ls_detail(self, path):
+    return self._call('ls_detail', path)
+
   def copy(self, src, dst):
     return self._call('copy', src, dst)
 
@@ -46,6 +46,10 @@ class Mapper(UFS):
       },
     )
 
+  @property
+  def supports_fork(self):
+    return all(ufs.supports_fork for ufs in self._pathmap.values())
+
   def ls(self, path):
     prefix, prefix_subpath, prefix_listing = list_prefix_tree(self._prefix_tree, path)
     ufs = self._pathmap.get(prefix)
@@ -84,6 +88,10 @@ class Mapper(UFS):
     ufs, ufs_fd = self._fds[fd]
     return ufs.read(ufs_fd, amnt)
 
+  def readinto(self, fd, buffer):
+    ufs, ufs_fd = self._fds[fd]
+    return ufs.readinto(ufs_fd, buffer)
+
   def write(self, fd, data):
     ufs, ufs_fd = self._fds[fd]
     return ufs.write(ufs_fd, data)
@@ -95,6 +103,9 @@ class Mapper(UFS):
   def flush(self, fd):
     ufs, ufs_fd = self._fds[fd]
     return ufs.flush(ufs_fd)
+  def presign(self, path, expires = 3600):
+    ufs, subpath = self._matchpath(path)
+    return ufs.presign(subpath, expires)
 
   def close(self, fd):
     ufs, ufs_fd = self._fds.pop(fd)
@@ -18,6 +18,8 @@ class MemoryFileDescriptor:
   stream: io.BytesIO
 
 class Memory(UFS):
+  supports_fork = True
+
   def __init__(self):
     super().__init__()
     self._inodes: dict[SafePurePosixPath_, MemoryInode] = {
@@ -32,9 +34,14 @@ class Memory(UFS):
     self._cfd = iter(itertools.count(start=5))
     self._fds: dict[int, MemoryFileDescriptor] = {}
 
+  def _listing(self, path):
+    try: return self._dirs[path]
+    except KeyError:
+      if path in self._inodes: raise NotADirectoryError(path)
+      raise FileNotFoundError(path)
+
   def ls(self, path):
-    try: return list(self._dirs[path])
-    except KeyError: raise FileNotFoundError(path)
+    return list(self._listing(path))
 
   def info(self, path):
     try: return self._inodes[path].info
@@ -56,6 +63,8 @@ class Memory(UFS):
     return self._fds[fd].stream.seek(pos, whence)
   def read(self, fd, amnt = -1):
     return self._fds[fd].stream.read(amnt)
+  def readinto(self, fd, buffer):
+    return self._fds[fd].stream.readinto(buffer)
   def write(self, fd, data: bytes):
     ret = self._fds[fd].stream.write(data)
     self._inodes[self._fds[fd].path].info['size'] = len(self._fds[fd].stream.getvalue())
@@ -92,6 +101,9 @@ class Memory(UFS):
     del self._dirs[path]
     del self._inodes[path]
 
+  def ls_detail(self, path):
+    return {name: self._inodes[path / name].info for name in self._listing(path)}
+
   def copy(self, src, dst):
     if src not in self._inodes: raise FileNotFoundError(src)
     if self._inodes[src].info['type'] == 'directory': raise IsADirectoryError(src)
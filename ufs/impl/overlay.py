@@ -76,6 +76,10 @@ class Overlay(UFS):
     provider, fd = self._fds[fd]
     return provider.read(fd, amnt)
 
+  def readinto(self, fd, buffer):
+    provider, fd = self._fds[fd]
+    return provider.readinto(fd, buffer)
+
   def write(self, fd, data):
     provider, fd = self._fds[fd]
     assert provider is self._upper
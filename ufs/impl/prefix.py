@@ -30,6 +30,10 @@ class Prefix(UFS):
       prefix=str(self._prefix),
     )
 
+  @property
+  def supports_fork(self):
+    return self._ufs.supports_fork
+
   def ls(self, path):
     return self._ufs.ls(self._prefix / path)
   def info(self, path):
@@ -40,6 +44,10 @@ class Prefix(UFS):
     return self._ufs.seek(fd, pos, whence)
   def read(self, fd, amnt):
     return self._ufs.read(fd, amnt)
+  def readinto(self, fd, buffer):
+    return self._ufs.readinto(fd, buffer)
+  def fileno(self, fd):
+    return self._ufs.fileno(fd)
   def write(self, fd, data):
     return self._ufs.write(fd, data)
   def truncate(self, fd, length):
@@ -49,6 +57,11 @@ class Prefix(UFS):
   def unlink(self, path):
     return self._ufs.unlink(self._prefix / path)
 
+  def cat(self, path):
+    return self._ufs.cat(self._prefix / path)
+  def put(self, path, data, *, size_hint = None):
+    return self._ufs.put(self._prefix / path, data, size_hint=size_hint)
+
   # optional
   def mkdir(self, path):
     return self._ufs.mkdir(self._prefix / path)
@@ -56,8 +69,13 @@ class Prefix(UFS):
     return self._ufs.rmdir(self._prefix / path)
   def flush(self, fd):
     return self._ufs.flush(fd)
+  def presign(self, path, expires = 3600):
+    return self._ufs.presign(self._prefix / path, expires)
 
   # fallback
+  def ls_detail(self, path):
+    return self._ufs.ls_detail(self._prefix / path)
+
   def copy(self, src, dst):
     return self._ufs.copy(self._prefix / src, self._prefix / dst)
 
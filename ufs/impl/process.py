@@ -9,12 +9,15 @@ mp_spawn = mp.get_context('spawn')
 
 def ufs_proc(send: mp_spawn.Queue, recv: mp_spawn.Queue, ufs_spec):
   ufs = UFS.from_dict(**ufs_spec)
+  # bound methods by op, so they're only looked up once
+  dispatch = {}
   while True:
     msg = recv.get()
     i, op, args, kwargs = msg
     if op is None: break
     try:
-      func = getattr(ufs, op)
+      func = dispatch.get(op)
+      if func is None: func = dispatch[op] = getattr(ufs, op)
       res = func(*args, **kwargs)
     except Exception as err:
       send.put([i, None, err])
@@ -84,8 +87,13 @@ class Process(UFS):
     return self._forward('rmdir', path)
   def flush(self, fd):
     return self._forward('flush', fd)
+  def presign(self, path, expires = 3600):
+    return self._forward('presign', path, expires)
 
   # fallback
+  def ls_detail(self, path):
+    return self._forward('ls_detail', path)
+
   def copy(self, src, dst):
     return self._forward('copy', src, dst)
 
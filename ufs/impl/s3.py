@@ -328,6 +328,13 @@ class S3(FSSpec, UFS):
       + [p.name for p in self._blankfiles if p.parent == path]
     )
 
+  def ls_detail(self, path):
+    return {
+      **FSSpec.ls_detail(self, path),
+      **{p.name: info for p, info in self._dirs.items() if p.parent == path},
+      **{p.name: info for p, info in self._blankfiles.items() if p.parent == path},
+    }
+
   def info(self, path) -> FileStat:
     if path in self._blankfiles:
        return self._blankfiles[path]
@@ -335,6 +342,11 @@ class S3(FSSpec, UFS):
       return self._dirs[path]
     return FSSpec.info(self, path)
 
+  def presign(self, path, expires = 3600):
+    if path in self._blankfiles or path in self._dirs: return None
+    # the caching filesystem doesn't forward sign, go straight to s3
+    return self._fs.fs.sign(self._path(path), expiration=expires)
+
   def mkdir(self, path):
     if str(path).count('/') >= 2:
       if path in self._dirs: raise FileExistsError(path)
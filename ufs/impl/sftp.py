@@ -44,7 +44,12 @@ class SFTP(UFS):
     self._ssh.close()
 
   def ls(self, path):
-    return self._sftp.listdir(str(path))
+    try:
+      return self._sftp.listdir(str(path))
+    except FileNotFoundError:
+      # sftp has no status for listing a file, find out if that's what happened
+      if self.info(path)['type'] != 'directory': raise NotADirectoryError(path)
+      raise
 
   def info(self, path):
     info = self._sftp.stat(str(path))
@@ -67,7 +72,9 @@ class SFTP(UFS):
     return fd
 
   def seek(self, fd, pos, whence = 0):
-    return self._fds[fd].seek(pos, whence)
+    # paramiko's seek doesn't return the new position
+    self._fds[fd].seek(pos, whence)
+    return self._fds[fd].tell()
   def read(self, fd, amnt):
     return self._fds[fd].read(amnt)
   def write(self, fd, data: bytes):
@@ -26,38 +26,43 @@ class AsyncExecutor:
     await asyncio.gather(*self.tasks.values())
     del self.tasks
 
-async def _run_and_return(ufs, send, task_id, op, args, kwargs):
-  try:
-    func = getattr(ufs, op)
-    res = await func(*args, **kwargs)
-  except Exception as err:
-    await send.put([task_id, None, err])
-  else:
-    await send.put([task_id, res, None])
-
 async def async_ufs_proc(reply: queue.Queue, ufs_spec):
+  ''' Construct the ufs in this event loop and hand it back, callers submit its coroutines
+  to the loop themselves & each gets its own future for the result
+  '''
   loop = asyncio.get_event_loop()
-  send, recv = asyncio.PriorityQueue(), asyncio.PriorityQueue()
-  reply.put_nowait((loop, send, recv))
+  stopped = asyncio.Event()
   ufs = UFS.from_dict(**ufs_spec)
-  async with AsyncExecutor() as exec:
-    while True:
-      msg = await recv.get()
-      i, op, args, kwargs = msg
-      if op == None:
-        recv.task_done()
-        break
-      exec.submit(_run_and_return, ufs, send, *msg)
-      recv.task_done()
+  reply.put_nowait((loop, ufs, stopped))
+  await stopped.wait()
+  # let anything still running finish before the loop goes away
+  await asyncio.gather(*(task for task in asyncio.all_tasks() if task is not asyncio.current_task()))
+
+def new_event_loop():
+  ''' uvloop when it's installed (it does less work per event than the default selector loop),
+  otherwise a regular asyncio event loop
+  '''
+  try:
+    import uvloop
+  except ImportError:
+    return asyncio.new_event_loop()
+  else:
+    return uvloop.new_event_loop()
 
 def event_loop_thread(send: queue.Queue, ufs_spec):
-  asyncio.run(async_ufs_proc(send, ufs_spec))
+  loop = new_event_loop()
+  try:
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(async_ufs_proc(send, ufs_spec))
+    loop.run_until_complete(loop.shutdown_asyncgens())
+  finally:
+    asyncio.set_event_loop(None)
+    loop.close()
 
 class Sync(UFS):
   def __init__(self, ufs: AsyncUFS):
     super().__init__()
     self._ufs = ufs
-    self._taskid = iter(itertools.count())
 
   @staticmethod
   def from_dict(*, ufs):
@@ -72,17 +77,7 @@ class Sync(UFS):
   
   def _forward(self, op, *args, **kwargs):
     self.start()
-    i, i_ = next(self._taskid), None
-    asyncio.run_coroutine_threadsafe(self._send.put([i, op, args, kwargs]), self._loop).result()
-    while True:
-      i_, ret, err = asyncio.run_coroutine_threadsafe(self._recv.get(), self._loop).result()
-      self._recv.task_done()
-      if i == i_:
-        break
-      # a different result came before ours, add it back to the queue and try again
-      asyncio.run_coroutine_threadsafe(self._recv.put([i_, ret, err]), self._loop).result()
-    if err is not None: raise err
-    else: return ret
+    return asyncio.run_coroutine_threadsafe(getattr(self._loop_ufs, op)(*args, **kwargs), self._loop).result()
 
   def ls(self, path):
     return self._forward('ls', path)
@@ -118,8 +113,13 @@ class Sync(UFS):
     return self._forward('rmdir', path)
   def flush(self, fd):
     return self._forward('flush', fd)
+  def presign(self, path, expires = 3600):
+    return self._forward('presign', path, expires)
 
   # fallback
+  def ls_detail(self, path):
+    return self._forward('ls_detail', path)
+
   def copy(self, src, dst):
     return self._forward('copy', src, dst)
 
@@ -134,14 +134,13 @@ class Sync(UFS):
         args=(reply, self._ufs.to_dict()),
       )
       self._loop_thread.start()
-      self._loop, self._recv, self._send = reply.get()
+      self._loop, self._loop_ufs, self._stopped = reply.get()
       reply.task_done()
       self._forward('start')
 
   def stop(self):
     if hasattr(self, '_loop'):
       self._forward('stop')
-      asyncio.run_coroutine_threadsafe(self._send.put([next(iter(self._taskid)), None, None, None]), self._loop).result()
+      self._loop.call_soon_threadsafe(self._stopped.set)
       self._loop_thread.join()
-      self._loop.close()
       del self._loop
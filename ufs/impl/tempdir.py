@@ -29,6 +29,10 @@ class TemporaryDirectory(UFS):
       ufs=self._ufs.to_dict(),
     )
 
+  @property
+  def supports_fork(self):
+    return self._ufs.supports_fork
+
   def ls(self, path):
     return self._ufs.ls(self._tmpdir / path)
   def info(self, path):
@@ -39,6 +43,8 @@ class TemporaryDirectory(UFS):
     return self._ufs.seek(fd, pos, whence)
   def read(self, fd, amnt):
     return self._ufs.read(fd, amnt)
+  def readinto(self, fd, buffer):
+    return self._ufs.readinto(fd, buffer)
   def write(self, fd, data):
     return self._ufs.write(fd, data)
   def truncate(self, fd, length):
@@ -55,8 +61,13 @@ class TemporaryDirectory(UFS):
     return self._ufs.rmdir(self._tmpdir / path)
   def flush(self, fd):
     return self._ufs.flush(fd)
+  def presign(self, path, expires = 3600):
+    return self._ufs.presign(self._tmpdir / path, expires)
 
   # fallback
+  def ls_detail(self, path):
+    return self._ufs.ls_detail(self._tmpdir / path)
+
   def copy(self, src, dst):
     return self._ufs.copy(self._tmpdir / src, self._tmpdir / dst)
 
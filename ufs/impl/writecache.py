@@ -78,6 +78,9 @@ class Writecache(UFS):
   def read(self, fd, amnt):
     ufs, fh, _ = self._fds[fd]
     return ufs.read(fh, amnt)
+  def readinto(self, fd, buffer):
+    ufs, fh, _ = self._fds[fd]
+    return ufs.readinto(fh, buffer)
   def write(self, fd, data):
     ufs, fh, _ = self._fds[fd]
     return ufs.write(fh, data)
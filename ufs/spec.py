@@ -37,7 +37,8 @@ class AtomicFromDescriptorMixin:
 class ReadableIterator:
   def __init__(self, iterator: t.Iterator[bytes]) -> None:
     self.iterator = iter(iterator)
-    self.buffer = b''
+    # a bytearray so growing it as chunks arrive is amortized rather than a copy every time
+    self.buffer = bytearray()
     self.pos = 0
 
   def read(self, amnt = -1):
@@ -47,9 +48,13 @@ class ReadableIterator:
       except StopIteration:
         break
       self.buffer += buf
-    ret = self.buffer if amnt == -1 else self.buffer[:amnt]
+    if amnt == -1 or amnt >= len(self.buffer):
+      ret = bytes(self.buffer)
+      self.buffer.clear()
+    else:
+      ret = bytes(self.buffer[:amnt])
+      del self.buffer[:amnt]
     self.pos += len(ret)
-    self.buffer = self.buffer[len(ret):]
     return ret
 
 class QueuedIterator(Queue):
@@ -126,6 +131,8 @@ class UFS:
   ''' A generic class interface for universal file system implementations
   '''
   CHUNK_SIZE = 5*1024
+  # whether a forked copy of this instance still works, otherwise other processes need to use from_dict
+  supports_fork = False
 
   @staticmethod
   def from_dict(*, cls, **kwargs):
@@ -168,6 +175,10 @@ class UFS:
     pass
   def flush(self, fd: int):
     pass
+  def presign(self, path: SafePurePosixPath_, expires: int = 3600) -> t.Optional[str]:
+    ''' A url which can be used to fetch the file directly from the underlying store, if it has one
+    '''
+    return None
   def start(self):
     pass
   def stop(self):
@@ -180,6 +191,18 @@ class UFS:
     AtomicFromDescriptorMixin.put(self, path, data, size_hint=size_hint)
 
   # fallback
+  def ls_detail(self, path: SafePurePosixPath_) -> t.Dict[str, FileStat]:
+    ''' ls & info of each entry, implementations which get this in bulk should override it
+    '''
+    return {name: self.info(path / name) for name in self.ls(path)}
+
+  def readinto(self, fd: int, buffer: memoryview) -> int:
+    ''' read directly into a writable buffer, implementations which can do so without an intermediate bytes should override it
+    '''
+    data = self.read(fd, len(buffer))
+    buffer[:len(data)] = data
+    return len(data)
+
   def copy(self, src: SafePurePosixPath_, dst: SafePurePosixPath_):
     src_info = self.info(src)
     if src_info['type'] != 'file':
@@ -226,7 +249,8 @@ class AsyncAtomicFromDescriptorMixin:
 class ReadableAsyncIterator:
   def __init__(self, iterator: t.AsyncIterator[bytes]) -> None:
     self.iterator = aiter(iterator)
-    self.buffer = b''
+    # a bytearray so growing it as chunks arrive is amortized rather than a copy every time
+    self.buffer = bytearray()
     self.pos = 0
   async def read(self, amnt = -1):
     while amnt == -1 or amnt > len(self.buffer):
@@ -235,9 +259,13 @@ class ReadableAsyncIterator:
       except StopAsyncIteration:
         break
       self.buffer += buf
-    ret = self.buffer if amnt == -1 else self.buffer[:amnt]
+    if amnt == -1 or amnt >= len(self.buffer):
+      ret = bytes(self.buffer)
+      self.buffer.clear()
+    else:
+      ret = bytes(self.buffer[:amnt])
+      del self.buffer[:amnt]
     self.pos += len(ret)
-    self.buffer = self.buffer[len(ret):]
     return ret
 
 class QueuedAsyncIterator(asyncio.Queue):
@@ -361,12 +389,28 @@ class AsyncUFS:
     pass
   async def flush(self, fd: int):
     pass
+  async def presign(self, path: SafePurePosixPath_, expires: int = 3600) -> t.Optional[str]:
+    ''' A url which can be used to fetch the file directly from the underlying store, if it has one
+    '''
+    return None
   async def start(self):
     pass
   async def stop(self):
     pass
 
   # fallback
+  async def ls_detail(self, path: SafePurePosixPath_) -> t.Dict[str, FileStat]:
+    ''' ls & info of each entry, implementations which get this in bulk should override it
+    '''
+    return {name: await self.info(path / name) for name in await self.ls(path)}
+
+  async def readinto(self, fd: int, buffer: memoryview) -> int:
+    ''' read directly into a writable buffer, implementations which can do so without an intermediate bytes should override it
+    '''
+    data = await self.read(fd, len(buffer))
+    buffer[:len(data)] = data
+    return len(data)
+
   async def copy(self, src: SafePurePosixPath_, dst: SafePurePosixPath_):
     src_info = await self.info(src)
     if src_info['type'] != 'file':
@@ -41,7 +41,7 @@ def drs_client(drs_server):
       yield drs
 
 def test_drs(ufs, drs_client):
-  from ufs.access.drs import index_ufs_for_drs
+  from ufs.access.drs import index_ufs_for_drs, sha256
   from ufs.access.pathlib import UPath
   index = index_ufs_for_drs(ufs)
   drs = UPath(drs_client)
@@ -51,4 +51,65 @@ def test_drs(ufs, drs_client):
   assert (drs / index['sha256sums']['/b/c']).is_file()
   assert (drs / index['sha256sums']['/b/d']).is_file()
   assert {p.name for p in (drs / index['sha256sums']['/'] / 'b').iterdir()} == {'c', 'd'}
+  assert index['sha256sums']['/b'] == sha256(map(str.encode, index['bundles']['/b']))
   with pytest.raises(FileNotFoundError): (drs/'nowhere').read_text()
+
+def test_drs_data_range(ufs, drs_server):
+  import requests
+  from ufs.access.drs import index_ufs_for_drs
+  index = index_ufs_for_drs(ufs)
+  url = f"http://{drs_server}/ga4gh/drs/v1/objects/{index['sha256sums']['/a']}/data"
+  req = requests.get(url, headers={'Range': 'bytes=6-'})
+  assert req.status_code == 206 and req.content == b'World!'
+  assert requests.get(url, headers={'If-None-Match': requests.get(url).headers['ETag']}).status_code == 304
+
+@pytest.mark.parametrize('presigned', [True, False])
+def test_drs_presign(ufs, presigned):
+  flask = pytest.importorskip('flask')
+  from ufs.impl.prefix import Prefix
+  from ufs.impl.memory import Memory
+  from ufs.access.drs import index_ufs_for_drs, flask_ufs_for_drs
+  from ufs.access.blob import flask_ufs_for_blob
+  class Presigned(Prefix):
+    def presign(self, path, expires = 3600):
+      return f"https://store.example{self._prefix / path}?expires={expires}" if presigned else None
+  ufs = Presigned(ufs)
+  index = index_ufs_for_drs(ufs, {})
+  drs = flask_ufs_for_drs(ufs, index, app=flask.Flask(__name__), public_url='http://localhost').test_client()
+  blob = flask_ufs_for_blob(ufs, Memory(), app=flask.Flask(__name__), public_url='http://localhost').test_client()
+  for client, url in [
+    (drs, f"/ga4gh/drs/v1/objects/{index['sha256sums']['/a']}/data"),
+    (blob, '/ufs/blob/v1/objects/a'),
+  ]:
+    res = client.get(url)
+    if presigned:
+      assert res.status_code == 302
+      assert res.headers['Location'] == 'https://store.example/a?expires=3600'
+    else:
+      assert res.status_code == 200
+      assert res.data == b'Hello World!'
+
+def test_drs_data_conditional_range(ufs):
+  flask = pytest.importorskip('flask')
+  from ufs.access.drs import index_ufs_for_drs, flask_ufs_for_drs
+  index = index_ufs_for_drs(ufs, {})
+  client = flask_ufs_for_drs(ufs, index, app=flask.Flask(__name__), public_url='http://localhost').test_client()
+  url = f"/ga4gh/drs/v1/objects/{index['sha256sums']['/a']}/data"
+  full = client.get(url)
+  assert full.status_code == 200 and full.data == b'Hello World!'
+  etag, last_modified = full.headers['ETag'], full.headers['Last-Modified']
+  def get(**headers):
+    res = client.get(url, headers=headers)
+    return res.status_code, res.data
+  assert get(Range='bytes=-5') == (206, b'orld!')
+  assert get(Range='bytes=-100') == (206, b'Hello World!')
+  assert get(Range='bytes=6-100') == (206, b'World!')
+  # multiple ranges fall back to the whole file
+  assert get(Range='bytes=0-1,4-5') == (200, b'Hello World!')
+  # unsatisfiable
+  assert get(Range='bytes=12-')[0] == 416
+  # the etag is weak, If-Range must never match it
+  assert get(Range='bytes=6-', **{'If-Range': etag}) == (200, b'Hello World!')
+  # If-Range dates must match exactly
+  assert get(Range='bytes=6-', **{'If-Range': last_modified}) == (206, b'World!')
+  assert get(Range='bytes=6-', **{'If-Range': 'Thu, 01 Jan 2099 00:00:00 GMT'}) == (200, b'Hello World!')
@@ -48,3 +48,63 @@ async def test_async_mount(fuse):
     assert not mnt.exists()
     assert (tmpdir/'output'/'test2').read_text() == 'hi'
     assert (tmpdir/'output'/'test3').read_text() == 'hi'
+
+@pytest.mark.parametrize('watch', [True, False])
+def test_ffuse_sync(watch):
+  from ufs.impl.memory import Memory
+  from ufs.access.pathlib import UPath
+  from ufs.access.ffuse import ffuse_mount
+  class WriteTrackingMemory(Memory):
+    def open(self, path, mode, *, size_hint = None):
+      if 'r' not in mode: written.add(str(path))
+      return super().open(path, mode, size_hint=size_hint)
+  written = set()
+  ufs = WriteTrackingMemory()
+  upath = UPath(ufs)
+  (upath/'a').mkdir()
+  (upath/'a'/'b').write_text('b')
+  (upath/'c').write_text('c')
+  (upath/'d').write_text('d')
+  (upath/'h').write_text('h')
+  written.clear()
+  with ffuse_mount(ufs, watch=watch) as mnt:
+    (mnt/'a'/'b').unlink()
+    (mnt/'a').rmdir()
+    (mnt/'c').write_text('C')
+    (mnt/'d').rename(mnt/'e')
+    (mnt/'f').mkdir()
+    (mnt/'f'/'g').write_text('g')
+  assert {p.name for p in upath.iterdir()} == {'c', 'e', 'f', 'h'}
+  assert (upath/'c').read_text() == 'C'
+  assert (upath/'e').read_text() == 'd'
+  assert (upath/'f'/'g').read_text() == 'g'
+  assert written == {'/c', '/e', '/f/g'}
+
+def test_fuse_inline_read():
+  pytest.importorskip('fuse')
+  import os
+  from ufs.impl.memory import Memory
+  from ufs.access.pathlib import UPath
+  from ufs.access.fuse import FUSEOps
+  ufs = Memory()
+  data = os.urandom(10000)
+  (UPath(ufs)/'small').write_bytes(data)
+  (UPath(ufs)/'large').write_bytes(data)
+  ops = FUSEOps(ufs, inline_threshold=len(data))
+  fh = ops.open('/small', os.O_RDONLY)
+  assert fh in ops._inline
+  for offset, size in [(0, 4096), (4096, 4096), (8192, 4096), (9999, 10), (10000, 10), (123, 0), (5000, 1)]:
+    assert ops.read('/small', size, offset, fh) == data[offset:offset+size]
+  ops.release('/small', fh)
+  # bigger than the threshold
+  ops = FUSEOps(ufs, inline_threshold=len(data) - 1)
+  fh = ops.open('/large', os.O_RDONLY)
+  assert fh not in ops._inline
+  assert ops.read('/large', 4096, 8192, fh) == data[8192:12288]
+  ops.release('/large', fh)
+  # no attribute cache, no inlining
+  ops = FUSEOps(ufs, attr_cache_ttl=0, inline_threshold=len(data))
+  fh = ops.open('/small', os.O_RDONLY)
+  assert fh not in ops._inline
+  assert ops.read('/small', 4096, 4096, fh) == data[4096:8192]
+  ops.release('/small', fh)
@@ -24,6 +24,28 @@ def test_os(ufs: UFS):
   assert os.listdir('/') == []
   with pytest.raises(FileNotFoundError): os.stat('/test')
 
+def test_os_pread_pwrite(ufs: UFS):
+  import os as _os
+  import errno
+  from ufs.access.os import UOS
+  os = UOS(ufs)
+  fd = os.open('/pread', _os.O_WRONLY | _os.O_CREAT)
+  os.write(fd, b'hello')
+  os.close(fd)
+  try: fd = os.open('/pread', _os.O_RDWR)
+  except OSError as e:
+    if e.errno != errno.ENOTSUP: raise
+    os.unlink('/pread')
+    pytest.skip('read/write descriptors not supported')
+  assert os.read(fd, 1) == b'h'
+  assert os.pread(fd, 3, 1) == b'ell'
+  assert os.pwrite(fd, b'XY', 0) == 2
+  # neither moved the file position
+  assert os.read(fd, 10) == b'Yllo'
+  assert os.pread(fd, 10, 0) == b'XYllo'
+  os.close(fd)
+  os.unlink('/pread')
+
 def test_map(ufs: UFS):
   from ufs.access.map import UMap
   M = UMap(ufs)
@@ -138,3 +160,17 @@ def test_singlefile_mapper():
     (UPath(backing) / 'B').write_text('b')
     assert [p.name for p in UPath(ufs).iterdir()] == ['A']
     assert (UPath(ufs)/'A').read_text() == 'a'
+
+def test_ls_detail(ufs: UFS):
+  path = UPath(ufs) / 'ls_detail'
+  path.mkdir()
+  (path/'a').write_text('a')
+  (path/'b').mkdir()
+  (path/'b'/'c').write_text('c')
+  p = SafePurePosixPath('ls_detail')
+  assert ufs.ls_detail(p) == {n: ufs.info(p/n) for n in ufs.ls(p)}
+  assert set(ufs.ls_detail(p/'b')) == {'c'}
+  with pytest.raises(NotADirectoryError): ufs.ls(p/'a')
+  with pytest.raises(NotADirectoryError): ufs.ls_detail(p/'a')
+  with pytest.raises(FileNotFoundError): ufs.ls(p/'d')
+  with pytest.raises(FileNotFoundError): ufs.ls_detail(p/'d')
@@ -2,6 +2,7 @@
 resolve function for at most ttl seconds.
 '''
 import time
+import threading
 import typing as t
 import dataclasses
 
@@ -13,25 +14,56 @@ class TTLValue:
   ttl: float = 0
 
 class TTLCacheStore(t.Generic[T]):
-  def __init__(self, ttl=60):
+  ''' :params maxsize: When set, the oldest entries are evicted to keep at most this many
+
+  The store may be shared between threads (e.g. a multi-threaded FUSE mount), so every
+  access to the underlying dict is made under a lock.
+  '''
+  def __init__(self, ttl=60, maxsize=None):
     self._ttl = ttl
+    self._maxsize = maxsize
     self._cache: t.Dict[str, TTLValue] = {}
+    self._lock = threading.Lock()
   
   def __getitem__(self, key: str) -> t.Any:
-    item = self._cache[key]
-    if time.time() > item.ttl:
-      self._cache.pop(key)
-      raise KeyError(key)
-    return item.val
+    with self._lock:
+      item = self._cache[key]
+      if time.time() > item.ttl:
+        self._cache.pop(key, None)
+        raise KeyError(key)
+      return item.val
 
   def __setitem__(self, key: str, val: T):
-    self._cache[key] = TTLValue(
-      val=val,
-      ttl=time.time()+self._ttl,
-    )
+    self.set(key, val)
+
+  def set(self, key: str, val: T, ttl: float = None):
+    ''' :params ttl: Keep this entry for a different number of seconds than the store's default
+    '''
+    with self._lock:
+      self._cache.pop(key, None)
+      if self._maxsize is not None and len(self._cache) >= self._maxsize:
+        self._cache.pop(next(iter(self._cache)), None)
+      self._cache[key] = TTLValue(
+        val=val,
+        ttl=time.time()+(self._ttl if ttl is None else ttl),
+      )
 
   def discard(self, key: str):
-    self._cache.pop(key, None)
+    with self._lock:
+      self._cache.pop(key, None)
+
+  def discard_prefix(self, prefix: str):
+    ''' Discard the entry for the path `prefix` and every path under it in one pass
+    '''
+    prefix = str(prefix)
+    subprefix = prefix.rstrip('/') + '/'
+    with self._lock:
+      for key in [key for key in self._cache if str(key) == prefix or str(key).startswith(subprefix)]:
+        self._cache.pop(key, None)
+
+  def clear(self):
+    with self._lock:
+      self._cache.clear()
 
 @dataclasses.dataclass
 class Result:
@@ -39,9 +71,12 @@ class Result:
   val: t.Optional[t.Any] = None
 
 class TTLCache(t.Generic[T]):
-  def __init__(self, resolve: t.Callable[[str], T], ttl=60):
+  ''' :params negative_ttl: Seconds to remember errors raised by resolve for, defaults to ttl
+  '''
+  def __init__(self, resolve: t.Callable[[str], T], ttl=60, maxsize=None, negative_ttl=None):
     self._resolve = resolve
-    self._store = TTLCacheStore(ttl=ttl)
+    self._negative_ttl = negative_ttl
+    self._store = TTLCacheStore(ttl=ttl, maxsize=maxsize)
 
   def __call__(self, key: str) -> T:
     try:
@@ -51,7 +86,9 @@ class TTLCache(t.Generic[T]):
         item = Result(val=self._resolve(key))
       except Exception as err:
         item = Result(err=err)
-      self._store[key] = item
+        self._store.set(key, item, self._negative_ttl)
+      else:
+        self._store[key] = item
     if item.err is not None:
       raise item.err
     else:
@@ -62,3 +99,9 @@ class TTLCache(t.Generic[T]):
 
   def discard(self, key: str):
     self._store.discard(key)
+
+  def discard_prefix(self, prefix: str):
+    self._store.discard_prefix(prefix)
+
+  def clear(self):
+    self._store.clear()
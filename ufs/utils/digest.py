@@ -0,0 +1,24 @@
+''' Hash constructors available for content digests
+
+hashlib.sha256 is already backed by OpenSSL which dispatches to the Intel SHA
+extensions (SHA-NI) / ARMv8 crypto extensions at runtime when the CPU supports them.
+'''
+from hashlib import sha256
+
+def blake3():
+  try:
+    import blake3
+  except ImportError:
+    raise ImportError('Install blake3 for blake3 digest support')
+  return blake3.blake3(max_threads=blake3.blake3.AUTO)
+
+digests = {
+  'sha256': sha256,
+  'blake3': blake3,
+}
+
+# DRS checksum type names
+checksum_types = {
+  'sha256': 'sha-256',
+  'blake3': 'blake3',
+}
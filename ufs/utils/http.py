@@ -0,0 +1,59 @@
+''' Serve a file from a ufs over flask with support for conditional & range requests
+'''
+import flask
+import datetime as dt
+from werkzeug.datastructures import ContentRange
+from ufs.spec import UFS, FileStat
+from ufs.utils.pathlib import SafePurePosixPath
+
+DOWNLOAD_CHUNK_SIZE = 1024*1024
+
+def file_response(ufs: UFS, path: SafePurePosixPath, info: FileStat, *, mimetype: str = 'application/octet-stream', chunk_size: int = DOWNLOAD_CHUNK_SIZE):
+  ''' Respond with the file's contents, a part of them (206) if a Range was requested,
+  or nothing (304) if the client's copy is still current.
+  '''
+  request = flask.request
+  size = info['size']
+  etag = f"{size}-{info.get('mtime', 0)}"
+  last_modified = dt.datetime.fromtimestamp(int(info['mtime']), dt.timezone.utc) if 'mtime' in info else None
+  response = flask.Response(mimetype=mimetype)
+  response.set_etag(etag, weak=True)
+  response.last_modified = last_modified
+  response.accept_ranges = 'bytes'
+  if request.if_none_match:
+    not_modified = request.if_none_match.contains_weak(etag)
+  else:
+    not_modified = last_modified is not None and request.if_modified_since is not None and last_modified <= request.if_modified_since
+  if not_modified:
+    response.status_code = 304
+    return response
+  start, stop = 0, size
+  if_range = request.if_range
+  # only a single byte range is served partially, anything else gets the whole file. If-Range needs a strong
+  # validator to match, our etag is weak so only an exact Last-Modified date lets the range through
+  ranges = request.range.ranges if request.range is not None and request.range.units == 'bytes' else []
+  if len(ranges) == 1 and if_range.etag is None and (
+    if_range.date is None
+    or (last_modified is not None and last_modified == if_range.date)
+  ):
+    start, stop = ranges[0]
+    if start < 0: start, stop = max(size + start, 0), size
+    else: stop = size if stop is None else min(stop, size)
+    if start >= stop:
+      response.status_code = 416
+      response.content_range = ContentRange('bytes', None, None, size)
+      return response
+    response.status_code = 206
+    response.content_range = ContentRange('bytes', start, stop, size)
+  fd = ufs.open(path, 'rb')
+  response.call_on_close(lambda: ufs.close(fd))
+  if start: ufs.seek(fd, start)
+  def body(remaining):
+    while remaining > 0:
+      chunk = ufs.read(fd, min(chunk_size, remaining))
+      if not chunk: break
+      remaining -= len(chunk)
+      yield chunk
+  response.response = body(stop - start)
+  response.content_length = stop - start
+  return response
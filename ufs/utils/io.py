@@ -1,39 +1,52 @@
 ''' Some custom IO Base generics since the core python ones are a bit odd
 '''
+import codecs
 
 class Buffer:
+  ''' A read buffer, data is consumed from the front by advancing an offset
+  so what's left is never re-copied and searches only scan unread data
+  '''
   def __init__(self) -> None:
     self.pos = 0
-    self.data = b''
+    self.data = bytearray()
+    self.offset = 0
+
+  def _consume(self, end):
+    ret = bytes(self.data[self.offset:end])
+    self.pos += len(ret)
+    if end >= len(self.data):
+      self.data.clear()
+      self.offset = 0
+    else:
+      self.offset = end
+    return ret
 
   def write(self, data: bytes):
+    if self.offset:
+      del self.data[:self.offset]
+      self.offset = 0
     self.data += data
 
   def trim(self, pos):
     if self.pos < pos:
-      self.data = self.data[pos - self.pos:]
+      self.offset = min(self.offset + pos - self.pos, len(self.data))
     elif self.pos > pos:
-      self.data = b''
+      self.data.clear()
+      self.offset = 0
 
   def read(self, amnt = -1):
-    ret = self.data if amnt == -1 else self.data[:amnt]
-    self.pos += len(ret)
-    self.data = self.data[len(ret):]
-    return ret
+    return self._consume(len(self.data) if amnt == -1 else self.offset + amnt)
 
   def read_until(self, delim):
-    left, sep, right = self.data.partition(delim)
-    if not sep:
-      self.pos += len(left)
-      self.data = b''
-      return left, False
+    idx = self.data.find(delim, self.offset)
+    if idx == -1:
+      return self._consume(len(self.data)), False
     else:
-      self.pos += len(left)+len(sep)
-      self.data = right
-      return left+sep, True
+      return self._consume(idx + len(delim)), True
 
 
 class RawBinaryIO:
+  __slots__ = ()
   def seek(self, amnt: int, whence: int = 0):
     raise NotImplementedError()
   def read(self, amnt = -1) -> bytes:
@@ -50,16 +63,25 @@ class RawBinaryIO:
     raise NotImplementedError()
 
 class BufferedBinaryIO:
-  def __init__(self, raw: RawBinaryIO, chunk_size = 4096, newline = b'\n') -> None:
+  ''' :params writeback: Coalesce writes smaller than chunk_size, they reach raw once chunk_size accumulates or on flush/seek/read/close
+  '''
+  def __init__(self, raw: RawBinaryIO, chunk_size = 4096, newline = b'\n', writeback = True) -> None:
     self.raw = raw
     self.pos = 0
     self.chunk_size = chunk_size
     self.read_buffer = Buffer()
+    self.write_buffer = bytearray() if writeback else None
     self.newline = newline
     self.closed = False
 
+  def _drain(self):
+    if self.write_buffer:
+      self.raw.write(bytes(self.write_buffer))
+      self.write_buffer.clear()
+
   def seek(self, amnt: int, whence: int = 0):
     assert not self.closed
+    self._drain()
     self.raw.seek(amnt, whence)
     if whence == 0: self.pos = amnt
     elif whence == 1: self.pos += amnt
@@ -68,6 +90,7 @@ class BufferedBinaryIO:
 
   def read(self, amnt = -1) -> bytes:
     assert not self.closed
+    self._drain()
     if amnt == 0:
       return b''
     ret = self.read_buffer.read(amnt)
@@ -78,15 +101,29 @@ class BufferedBinaryIO:
     self.pos += len(ret)
     return ret
 
+  def readinto(self, buffer) -> int:
+    data = self.read(len(buffer))
+    buffer[:len(data)] = data
+    return len(data)
+
+  def readable(self) -> bool:
+    return not self.closed
+
   def write(self, data: bytes) -> int:
     assert not self.closed
-    ret = self.raw.write(data)
+    if self.write_buffer is None or (not self.write_buffer and len(data) >= self.chunk_size):
+      ret = self.raw.write(data)
+    else:
+      self.write_buffer += data
+      ret = len(data)
+      if len(self.write_buffer) >= self.chunk_size: self._drain()
     self.pos += ret
     return ret
 
   def readline(self) -> bytes:
     assert not self.closed
-    ret = b''
+    self._drain()
+    ret = bytearray()
     while True:
       buf, found = self.read_buffer.read_until(self.newline)
       ret += buf
@@ -97,22 +134,26 @@ class BufferedBinaryIO:
         break
       self.read_buffer.write(buf)
     self.pos += len(ret)
-    return ret
+    return bytes(ret)
 
   def flush(self):
     assert not self.closed
+    self._drain()
     self.raw.flush()
 
   def tell(self) -> int:
     return self.pos
 
   def truncate(self, length: int = None):
+    self._drain()
     self.raw.truncate(self.pos if length is None else length)
 
   def close(self):
     assert not self.closed
-    self.closed = True
-    self.raw.close()
+    try: self._drain()
+    finally:
+      self.closed = True
+      self.raw.close()
 
   def __enter__(self):
     return self
@@ -128,22 +169,33 @@ class BufferedBinaryIO:
       yield line
 
 class BufferedIO(BufferedBinaryIO):
-  def __init__(self, raw: RawBinaryIO, chunk_size = 4096, newline = '\n', encoding = 'utf-8') -> None:
-    super().__init__(raw, chunk_size=chunk_size, newline=newline.encode(encoding) if type(newline) == str else newline)
+  ''' Text on top of BufferedBinaryIO, reads go through an incremental decoder so a
+  multi-byte character split between two reads is still decoded correctly
+  '''
+  def __init__(self, raw: RawBinaryIO, chunk_size = 4096, newline = '\n', encoding = 'utf-8', writeback = True) -> None:
+    super().__init__(raw, chunk_size=chunk_size, newline=newline.encode(encoding) if type(newline) == str else newline, writeback=writeback)
     self.encoding = encoding
-  
+    self._decoder = codecs.getincrementaldecoder(encoding)()
+
+  def seek(self, amnt: int, whence: int = 0):
+    self._decoder.reset()
+    return super().seek(amnt, whence)
+
   def read(self, amnt = -1) -> str:
-    return super().read(amnt).decode(self.encoding)
+    data = super().read(amnt)
+    return self._decoder.decode(data, final=amnt < 0 or not data)
 
   def write(self, data: str) -> int:
     return super().write(data.encode(self.encoding))
 
-  def readline(self) -> bytes:
-    return super().readline().decode(self.encoding)
+  def readline(self) -> str:
+    line = super().readline()
+    return self._decoder.decode(line, final=not line)
 
 
 
 class AsyncRawBinaryIO:
+  __slots__ = ()
   async def seek(self, amnt: int, whence: int = 0):
     raise NotImplementedError()
   async def read(self, amnt = -1) -> bytes:
@@ -160,16 +212,25 @@ class AsyncRawBinaryIO:
     raise NotImplementedError()
 
 class AsyncBufferedBinaryIO:
-  def __init__(self, raw: AsyncRawBinaryIO, chunk_size = 4096, newline = b'\n') -> None:
+  ''' :params writeback: Coalesce writes smaller than chunk_size, they reach raw once chunk_size accumulates or on flush/seek/read/close
+  '''
+  def __init__(self, raw: AsyncRawBinaryIO, chunk_size = 4096, newline = b'\n', writeback = True) -> None:
     self.raw = raw
     self.pos = 0
     self.chunk_size = chunk_size
     self.read_buffer = Buffer()
+    self.write_buffer = bytearray() if writeback else None
     self.newline = newline
     self.closed = False
 
+  async def _drain(self):
+    if self.write_buffer:
+      await self.raw.write(bytes(self.write_buffer))
+      self.write_buffer.clear()
+
   async def seek(self, amnt: int, whence: int = 0):
     assert not self.closed
+    await self._drain()
     await self.raw.seek(amnt, whence)
     if whence == 0: self.pos = amnt
     elif whence == 1: self.pos += amnt
@@ -178,6 +239,7 @@ class AsyncBufferedBinaryIO:
 
   async def read(self, amnt = -1) -> bytes:
     assert not self.closed
+    await self._drain()
     if amnt == 0:
       return b''
     ret = self.read_buffer.read(amnt)
@@ -190,13 +252,19 @@ class AsyncBufferedBinaryIO:
 
   async def write(self, data: bytes) -> int:
     assert not self.closed
-    ret = await self.raw.write(data)
+    if self.write_buffer is None or (not self.write_buffer and len(data) >= self.chunk_size):
+      ret = await self.raw.write(data)
+    else:
+      self.write_buffer += data
+      ret = len(data)
+      if len(self.write_buffer) >= self.chunk_size: await self._drain()
     self.pos += ret
     return ret
 
   async def readline(self) -> bytes:
     assert not self.closed
-    ret = b''
+    await self._drain()
+    ret = bytearray()
     while True:
       buf, found = self.read_buffer.read_until(self.newline)
       ret += buf
@@ -207,22 +275,26 @@ class AsyncBufferedBinaryIO:
         break
       self.read_buffer.write(buf)
     self.pos += len(ret)
-    return ret
+    return bytes(ret)
 
   async def flush(self):
     assert not self.closed
+    await self._drain()
     await self.raw.flush()
 
   async def tell(self) -> int:
     return self.pos
 
   async def truncate(self, length: int = None):
+    await self._drain()
     await self.raw.truncate(self.pos if length is None else length)
 
   async def close(self):
     assert not self.closed
-    self.closed = True
-    await self.raw.close()
+    try: await self._drain()
+    finally:
+      self.closed = True
+      await self.raw.close()
 
   async def __aenter__(self):
     return self
@@ -238,15 +310,25 @@ class AsyncBufferedBinaryIO:
       yield line
 
 class AsyncBufferedIO(AsyncBufferedBinaryIO):
-  def __init__(self, raw: AsyncRawBinaryIO, chunk_size = 4096, newline = '\n', encoding = 'utf-8') -> None:
-    super().__init__(raw, chunk_size=chunk_size, newline=newline.encode(encoding) if type(newline) == str else newline)
+  ''' Text on top of AsyncBufferedBinaryIO, reads go through an incremental decoder so a
+  multi-byte character split between two reads is still decoded correctly
+  '''
+  def __init__(self, raw: AsyncRawBinaryIO, chunk_size = 4096, newline = '\n', encoding = 'utf-8', writeback = True) -> None:
+    super().__init__(raw, chunk_size=chunk_size, newline=newline.encode(encoding) if type(newline) == str else newline, writeback=writeback)
     self.encoding = encoding
-  
+    self._decoder = codecs.getincrementaldecoder(encoding)()
+
+  async def seek(self, amnt: int, whence: int = 0):
+    self._decoder.reset()
+    return await super().seek(amnt, whence)
+
   async def read(self, amnt = -1) -> str:
-    return await super().read(amnt).decode(self.encoding)
+    data = await super().read(amnt)
+    return self._decoder.decode(data, final=amnt < 0 or not data)
 
   async def write(self, data: str) -> int:
     return await super().write(data.encode(self.encoding))
 
-  async def readline(self) -> bytes:
-    return await super().readline().decode(self.encoding)
+  async def readline(self) -> str:
+    line = await super().readline()
+    return self._decoder.decode(line, final=not line)
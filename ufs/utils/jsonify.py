@@ -0,0 +1,10 @@
+''' JSON serialization to bytes, using orjson when it's available
+'''
+try:
+  import orjson
+  def dumps(obj) -> bytes:
+    return orjson.dumps(obj)
+except ImportError:
+  import json
+  def dumps(obj) -> bytes:
+    return json.dumps(obj).encode()
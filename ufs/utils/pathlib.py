@@ -1,7 +1,10 @@
 import pathlib
+import functools
+import collections
 import typing as t
 
 class SafePurePosixPath_:
+  __slots__ = ('_path',)
   def __init__(self, path: pathlib.PurePosixPath = pathlib.PurePosixPath('/')):
     self._path = path
   def __reduce__(self):
@@ -61,6 +64,13 @@ def SafePurePosixPath(path: PathLike = None) -> SafePurePosixPath_:
     path = str(path)
   if isinstance(path, SafePurePosixPath_):
     return path
+  if isinstance(path, str):
+    return _parse_str(path)
+  return SafePurePosixPath_() / path
+
+@functools.lru_cache(maxsize=4096)
+def _parse_str(path: str) -> SafePurePosixPath_:
+  # SafePurePosixPath_ is immutable so parsed paths can be shared, the same few get parsed over and over (e.g. by fuse)
   return SafePurePosixPath_() / path
 
 def pathparent(path: str):
@@ -98,10 +108,19 @@ def coerce_pathlike(func: t.Callable):
 def rmtree(P: pathlib.Path):
   ''' This doesn't exist in normal pathlib but comes in handy
   '''
-  Q = [(P, True)] + [(path, False) for path in P.iterdir()]
+  from ufs.access.pathlib import UPath
+  if isinstance(P, UPath):
+    # the ufs walk gets the type of every entry from its directory's listing
+    from ufs.access.shutil import rmtree
+    try: rmtree(P._ufs, P._path)
+    finally: P.forget_subtree()
+    return
+  Q = collections.deque([(P, True)])
+  Q.extend((path, False) for path in P.iterdir())
   while Q:
     path, empty = Q.pop()
-    if path.is_file(): path.unlink()
-    elif path.is_dir():
-      if empty: path.rmdir()
-      else: Q += [(path, True)] + [(p, False) for p in path.iterdir()]
+    if not path.is_dir(): path.unlink()
+    elif empty: path.rmdir()
+    else:
+      Q.append((path, True))
+      Q.extend((p, False) for p in path.iterdir())
@@ -18,6 +18,7 @@ import threading
 import typing as t
 import multiprocessing as mp
 from subprocess import Popen
+from multiprocessing.process import BaseProcess
 from queue import Queue, Empty
 
 mp_spawn = mp.get_context('spawn')
@@ -28,9 +29,9 @@ class ProcessExitException(Exception):
     self.exitcode = exitcode
 
 def process_thread(queue: Queue):
-  proc: t.Union[mp.Process, mp_spawn.Process, Popen] = queue.get()
+  proc: t.Union[BaseProcess, Popen] = queue.get()
   try:
-    if isinstance(proc, mp.Process) or isinstance(proc, mp_spawn.Process):
+    if isinstance(proc, BaseProcess):
       proc.start()
       proc.join()
       exc = ProcessExitException(proc.exitcode)
@@ -49,7 +50,7 @@ def process_thread(queue: Queue):
     os.kill(mp.current_process().pid, signal.SIGINT)
 
 @contextlib.contextmanager
-def active_process(proc: t.Union[mp.Process, mp_spawn.Process, Popen], *, terminate_signal=signal.SIGTERM):
+def active_process(proc: t.Union[BaseProcess, Popen], *, terminate_signal=signal.SIGTERM):
   queue = Queue()
   thread = threading.Thread(
     target=process_thread,
@@ -68,7 +69,7 @@ def active_process(proc: t.Union[mp.Process, mp_spawn.Process, Popen], *, termin
       raise KeyboardInterrupt
   finally:
     queue.put(None)
-    if isinstance(proc, mp.Process) or isinstance(proc, mp_spawn.Process):
+    if isinstance(proc, BaseProcess):
       if proc.is_alive():
         os.kill(proc.pid, terminate_signal)
         proc.join()
@@ -12,6 +12,17 @@ def nc_z(host: str, port: int, timeout: int = 1):
   except:
     return False
 
+def tune_socket(sock: socket.socket, buffer_size: int = 1<<20, nodelay: bool = True):
+  ''' Disable Nagle's algorithm so small replies go out immediately, and enlarge the kernel
+  buffers so bulk transfers aren't throttled by them. Set the buffers on listening sockets
+  before listen() so accepted connections inherit them (& negotiate window scaling).
+  '''
+  if nodelay and sock.family in (socket.AF_INET, socket.AF_INET6):
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+  if buffer_size:
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, buffer_size)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_size)
+
 def autosocket(host='', port=0):
   with socket.socket() as s:
     s.bind((host, port))
@@ -1,5 +1,4 @@
 import re
-import json
 import typing as t
 from ufs.utils.one import one
 
@@ -48,6 +47,7 @@ def parse_netloc(url_parsed: URLParsed) -> NetlocParsed:
 
 
 def try_json_loads(s):
+  import json
   try: return json.loads(s)
   except: return s
 